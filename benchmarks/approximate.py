@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Accuracy and throughput of the approximate title match on the transcript bundled with the repository
+The titles spoken in the transcript, some of them mangled by VOSK, are added to synthetic catalogs of --titles
+movies. For each catalog, the titles found exactly and approximately are compared with the expected ones, and the
+approximate match is timed against a naive edit distance of every run of words with every title (measured on
+--naive-titles titles and extrapolated to the catalog):
+    python benchmarks/approximate.py --titles 10000 100000 --distance 1"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import synthetic
+import init
+from podscripter import fuzzyindex, nlp, parse, titleindex
+
+# titles spoken in the bundled transcript : (translated title, as transcribed), some of them mangled by VOSK
+SAMPLE_TITLES = [("L'Avventura", "la Ventura"), ("La Notte", "la noté"), ("L'Éclipse", "l'éclipse"),
+                 ("Le Désert rouge", "désert Rouge"), ("Les Jeunes Amants", "les jeunes amants"),
+                 ("Vous ne désirez que moi", "vous ne désirez que moi"), ("Red Rocket", "Red rocket")]
+
+
+def __catalog(work_dir, titles):
+    """Synthetic DB of this size, with the titles of the transcript"""
+    db_file = os.path.join(work_dir, "movies-%d.db" % titles)
+    synthetic.write_movie_db(db_file, titles)
+    conn = sqlite3.connect(db_file)
+    conn.executemany(init.SQL_INSERT_MOVIE, [(title, "ts%07d" % i, title, 7.0)
+                                             for i, (title, _) in enumerate(SAMPLE_TITLES)])
+    init.normalize_titles(conn)
+    conn.close()
+
+    parse.DB_FILE = db_file
+    parse.TITLE_INDEX_FILE = db_file + ".titles"
+    parse.APPROXIMATE_INDEX_FILE = db_file + ".approx"
+    parse.shared_index = parse.shared_approximate_index = None
+
+    return db_file
+
+
+def __naive_match(index, transcribed_text, distance, title_count):
+    """Edit distance of every run of words of the text with title_count titles spread over the index (its titles
+    are sorted by length)"""
+    words = [fuzzyindex.normalize(word) for word in transcribed_text.split()]
+    step = max(titleindex.title_count(index) // title_count, 1)
+    title_keys = [fuzzyindex.normalize(titleindex.title(index, title_index)[0])
+                  for title_index in range(0, titleindex.title_count(index), step)][:title_count]
+    title_keys = [key for key in title_keys
+                  if parse.APPROXIMATE_MIN_LENGTH <= len(key) <= parse.APPROXIMATE_MAX_LENGTH]
+    found = 0
+    for first in range(len(words)):
+        key = ""
+        for word in words[first:]:
+            key += word
+            if len(key) > parse.APPROXIMATE_MAX_LENGTH + distance:
+                break
+            for title_key in title_keys:
+                if fuzzyindex.edit_distance(key, title_key, distance) is not None:
+                    found += 1
+
+    return found
+
+
+def run(title_counts, distance, naive_titles):
+    """Runs the exact and approximate matches of the bundled transcript over each catalog"""
+    transcribed_text = nlp.read_transcript(synthetic.SAMPLE_TRANSCRIPT)
+    words = len(transcribed_text.split())
+    work_dir = tempfile.mkdtemp(prefix="podscripter-approximate-")
+    try:
+        for titles in title_counts:
+            __catalog(work_dir, titles)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                index = parse.__title_index()
+                index_time = time.perf_counter() - start
+                start = time.perf_counter()
+                parse.__approximate_index(index)
+                approximate_index_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            candidates = parse.__brute_match(index, transcribed_text)
+            exact_time = time.perf_counter() - start
+            start = time.perf_counter()
+            matched = parse.__approximate_match(index, transcribed_text, candidates, distance)
+            approximate_time = time.perf_counter() - start
+
+            # candidates of the brute match replaced by longer titles approximately matched are not counted
+            approximate_candidates = set(matched) - set(candidates)
+            candidates = set(matched) & set(candidates)
+            # the synthetic catalog may hold the same title under another imdbid
+            exact_titles = {text_title.casefold() for _, _, text_title, _ in candidates}
+            approximate_titles = {(text_title.casefold(), transcribed_text[start:end])
+                                  for start, end, text_title, _ in approximate_candidates}
+            print("Catalog of %d titles : title index %.2fs, approximate index %.2fs (%d entries)"
+                  % (titles + len(SAMPLE_TITLES), index_time, approximate_index_time,
+                     len(parse.shared_approximate_index["entries"])))
+            found = 0
+            for text_title, spoken in SAMPLE_TITLES:
+                matches = [said for title_found, said in approximate_titles if title_found == text_title.casefold()]
+                if text_title.casefold() in exact_titles:
+                    status = "exact"
+                elif matches:
+                    status = "approximate (%s)" % ", ".join(repr(said) for said in matches)
+                else:
+                    status = "MISSED"
+                found += status != "MISSED"
+                print("    %-26s said %-26r %s" % (text_title, spoken, status))
+            print("    recall %d/%d, %d exact and %d approximate candidates (%.1f approximate per 1000 words)"
+                  % (found, len(SAMPLE_TITLES), len(candidates), len(approximate_candidates),
+                     1000 * len(approximate_candidates) / words))
+            print("    brute match %.3fs, approximate match %.3fs (%d words/s)"
+                  % (exact_time, approximate_time, words / approximate_time))
+
+            if naive_titles:
+                start = time.perf_counter()
+                __naive_match(index, transcribed_text, distance, min(naive_titles, titleindex.title_count(index)))
+                naive_time = (time.perf_counter() - start) * titleindex.title_count(index) / min(
+                    naive_titles, titleindex.title_count(index))
+                print("    naive edit distance over every title : %.1fs (x%.0f)" % (naive_time,
+                                                                                   naive_time / approximate_time))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", nargs="+", type=int, default=[10000, 100000], help="sizes of the synthetic "
+                                                                                        "movie catalogs")
+    parser.add_argument("--distance", type=int, default=1, help="edits allowed")
+    parser.add_argument("--naive-titles", type=int, default=200, help="titles of the naive edit distance, timed "
+                                                                      "then extrapolated (0 to skip it)")
+    args = parser.parse_args()
+
+    run(args.titles, args.distance, args.naive_titles)
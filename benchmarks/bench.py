@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Benchmarks of the podscripter stages on synthetic data
+Each stage is timed in isolation, its setup (DB, index, tagged Doc...) being prepared beforehand, over catalogs
+of --titles movies and transcripts of --words words. The peak of memory allocated by the stage is measured in a
+separate run, under tracemalloc. Results can be saved as a baseline and compared with it on a later run:
+    python benchmarks/bench.py --titles 10000 100000 --words 2000 20000 --save
+    python benchmarks/bench.py --titles 10000 100000 --words 2000 20000 --compare"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+import spacy
+
+import synthetic
+import init
+from podscripter import nlp, parse, preparse, titleindex
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+STAGES = ["init_bulk_load", "init_row_load", "title_index", "targeted_index", "brute_match", "approximate_match",
+          "tag", "fine_match", "preparse"]
+# the row by row load commits every row, it is only run up to this catalog size
+ROW_LOAD_MAX_TITLES = 10000
+# number of titles of the catalog mentioned in the synthetic transcripts
+TRANSCRIPT_TITLES = 200
+# a stage is reported as a regression when it is slower than its baseline by more than this ratio
+DEFAULT_TOLERANCE = 0.2
+
+
+def __load_pipeline():
+    """spaCy pipeline used by the tagging stages, the blank French one when the model is not installed (the
+    timings are then not comparable with the real model, and fine_match, whose rules need POS tags, is skipped)"""
+    try:
+        nlp.shared_nlp = spacy.load(nlp.SPACY_MODEL, exclude=nlp.SPACY_EXCLUDED_COMPONENTS)
+    except OSError:
+        print("%s not installed, using a blank French pipeline" % nlp.SPACY_MODEL)
+        nlp.shared_nlp = spacy.blank("fr")
+
+    return "%s-%s" % (nlp.shared_nlp.meta["name"], nlp.shared_nlp.meta["version"])
+
+
+def __use_db(db_file):
+    """Points the parse to a synthetic DB and its title index"""
+    parse.DB_FILE = db_file
+    parse.TITLE_INDEX_FILE = db_file + ".titles"
+    parse.APPROXIMATE_INDEX_FILE = db_file + ".approx"
+
+
+def __catalog(work_dir, titles):
+    """Synthetic DB of this size, created once per run"""
+    db_file = os.path.join(work_dir, "movies-%d.db" % titles)
+    if not os.path.isfile(db_file):
+        synthetic.write_movie_db(db_file, titles)
+
+    return db_file
+
+
+def __transcript(work_dir, titles, words):
+    """Synthetic transcript mentioning titles of the catalog, as text and as a transcribed file"""
+    conn = sqlite3.connect(__catalog(work_dir, titles))
+    mentioned = [row[0] for row in conn.execute("select translated from movie where rating > 0 limit ?",
+                                                (TRANSCRIPT_TITLES,))]
+    conn.close()
+    text = synthetic.transcript(words, mentioned)
+    transcribed_file = os.path.join(work_dir, "transcript-%d-%d.txt" % (titles, words))
+    with open(transcribed_file, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    return nlp.read_transcript(transcribed_file), transcribed_file
+
+
+def __setup_stage(stage, work_dir, titles, words):
+    """Prepares a stage, returns the function running it once, None when the stage is not run at this size"""
+    nlp.last_doc = None
+
+    if stage in ("init_bulk_load", "init_row_load"):
+        if stage == "init_row_load" and titles > ROW_LOAD_MAX_TITLES:
+            return None
+        rows = list(synthetic.movie_rows(titles))
+        db_file = os.path.join(work_dir, "load.db")
+
+        def run():
+            if os.path.isfile(db_file):
+                os.remove(db_file)
+            conn = init.create_connection(db_file)
+            init.create_table(conn, init.SQL_MOVIE_TABLE)
+            init.create_index(conn, init.SQL_MOVIE_INDEX_IMDB)
+            init.create_index(conn, init.SQL_MOVIE_INDEX_TITLE)
+            if stage == "init_bulk_load":
+                init.__bulk_load(conn, init.SQL_INSERT_MOVIE, rows, ["idx_movieid", "movie_title_idx"],
+                                 [init.SQL_MOVIE_INDEX_IMDB, init.SQL_MOVIE_INDEX_TITLE])
+            else:
+                for movie in rows:
+                    init.create_movie(conn, movie)
+            conn.close()
+        return run
+
+    __use_db(__catalog(work_dir, titles))
+    if stage == "title_index":
+        def run():
+            if os.path.isfile(parse.TITLE_INDEX_FILE):
+                os.remove(parse.TITLE_INDEX_FILE)
+            titleindex.close_index(parse.__title_index())
+            parse.shared_index = None
+        return run
+
+    transcribed_text, transcribed_file = __transcript(work_dir, titles, words)
+    if stage == "targeted_index":
+        index_file = parse.TITLE_INDEX_FILE + ".targeted"
+
+        def run():
+            titleindex.close_index(parse.__targeted_index(transcribed_text, index_file))
+        return run
+
+    if stage == "tag":
+        def run():
+            nlp.last_doc = None
+            nlp.tag(transcribed_text)
+        return run
+
+    if stage == "preparse":
+        original_text = open(transcribed_file, encoding="utf-8").read()
+        preparse.names_lexicon = frozenset(synthetic.NAMES)
+
+        def run():
+            nlp.last_doc = None
+            with open(transcribed_file, "w", encoding="utf-8") as f:
+                f.write(original_text)
+            if os.path.isfile(transcribed_file + nlp.DOC_CACHE_EXTENSION):
+                os.remove(transcribed_file + nlp.DOC_CACHE_EXTENSION)
+            preparse.preparse(transcribed_file)
+        return run
+
+    index = parse.__title_index()
+    if stage == "brute_match":
+        return lambda: parse.__brute_match(index, transcribed_text)
+
+    if stage == "approximate_match":
+        candidates = parse.__brute_match(index, transcribed_text)
+        parse.__approximate_index(index)
+        return lambda: parse.__approximate_match(index, transcribed_text, candidates, 1)
+
+    if stage == "fine_match":
+        if not nlp.shared_nlp.has_pipe("morphologizer") and not nlp.shared_nlp.has_pipe("tagger"):
+            return None
+        candidates = parse.__brute_match(index, transcribed_text)
+        doc = nlp.tag(transcribed_text)
+        parse.__rule_matcher()
+        return lambda: parse.__fine_match(candidates, doc)
+
+
+def __measure(run, repeat):
+    """Best wall time and process time over the runs, then peak of memory allocated during one more run"""
+    wall = cpu = None
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        run()
+        elapsed_wall, elapsed_cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        wall = elapsed_wall if wall is None else min(wall, elapsed_wall)
+        cpu = elapsed_cpu if cpu is None else min(cpu, elapsed_cpu)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"wall": round(wall, 6), "cpu": round(cpu, 6), "peak_kb": peak // 1024}
+
+
+def run_benchmarks(stages, title_counts, word_counts, repeat=3):
+    """Runs the stages over every size. Returns the results by key "stage titles=... words=..." """
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="podscripter-bench-")
+    try:
+        for stage in stages:
+            # stages depending only on the catalog or only on the transcript are run once per size
+            sizes = [(titles, words) for titles in title_counts for words in word_counts]
+            if stage in ("init_bulk_load", "init_row_load", "title_index"):
+                sizes = [(titles, 0) for titles in title_counts]
+            elif stage in ("tag", "preparse"):
+                sizes = [(min(title_counts), words) for words in word_counts]
+
+            for titles, words in sizes:
+                key = "%s titles=%d words=%d" % (stage, titles if stage not in ("tag", "preparse") else 0, words)
+                # the stages print their progress, kept out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = __setup_stage(stage, work_dir, titles, words)
+                    if run is None:
+                        continue
+                    results[key] = __measure(run, repeat)
+                print("%-45s %10.4fs wall %10.4fs cpu %10d KB" % (key, results[key]["wall"], results[key]["cpu"],
+                                                                   results[key]["peak_kb"]))
+    finally:
+        shutil.rmtree(work_dir)
+
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Prints the ratio of each result to its baseline. Returns the keys slower than the baseline beyond tolerance"""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline["results"]:
+            continue
+        ratio = result["wall"] / baseline["results"][key]["wall"] if baseline["results"][key]["wall"] else 1
+        memory_ratio = result["peak_kb"] / baseline["results"][key]["peak_kb"] \
+            if baseline["results"][key]["peak_kb"] else 1
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "REGRESSION"
+            regressions.append(key)
+        print("%-45s x%.2f time x%.2f memory %s" % (key, ratio, memory_ratio, flag))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to benchmark")
+    parser.add_argument("--titles", nargs="+", type=int, default=[10000, 100000], help="sizes of the synthetic "
+                                                                                        "movie catalogs")
+    parser.add_argument("--words", nargs="+", type=int, default=[2000, 20000], help="sizes in words of the "
+                                                                                     "synthetic transcripts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each stage, the best one being kept")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="slowdown ratio reported as a "
+                                                                                   "regression")
+    args = parser.parse_args()
+
+    pipeline = __load_pipeline()
+    results = run_benchmarks(args.stages, args.titles, args.words, args.repeat)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["pipeline"] != pipeline:
+            print("Baseline measured with %s, not %s" % (baseline["pipeline"], pipeline))
+        if compare(results, baseline, args.tolerance):
+            exit(1)
+
+    if args.save:
+        baseline = {"python": platform.python_version(), "machine": platform.machine(), "pipeline": pipeline,
+                    "results": results}
+        if os.path.isfile(args.baseline):
+            # keeping the results of the stages and sizes not run this time
+            with open(args.baseline) as f:
+                baseline["results"] = dict(json.load(f)["results"], **results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print("Baseline saved in", args.baseline)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Startup time of the command line, action by action
+Each action is started in a fresh interpreter, up to the import of its module (the action itself is not run), and
+the best time over --repeat runs is compared with its target. The light actions must not import spaCy, VOSK or
+numpy:
+    python benchmarks/startup.py --repeat 5"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules imported by each action, after the command line
+ACTION_MODULES = {"help": [], "download": ["podscripter.download"], "convert": ["podscripter.convert"],
+                  "transcribe": ["podscripter.transcribe"], "stream": ["podscripter.transcribe"],
+                  "preparse": ["podscripter.preparse"], "parse": ["podscripter.parse"],
+                  "all": ["podscripter.convert", "podscripter.transcribe", "podscripter.preparse",
+                          "podscripter.parse"], "service": ["podscripter.service"],
+                  "ingest": ["podscripter.pipeline"]}
+# targets in seconds, interpreter startup included
+STARTUP_TARGETS = {"help": 0.15, "download": 0.5, "convert": 0.5, "transcribe": 0.5, "stream": 0.5,
+                   "preparse": 3.0, "parse": 3.0, "all": 3.5, "service": 3.0,
+                   "ingest": 0.5}
+
+
+def startup_time(action, repeat=3):
+    """Best time to start the command line and import the modules of the action, None if they cannot be imported"""
+    code = "import podscripter.__main__\n" + "".join("import %s\n" % module for module in ACTION_MODULES[action])
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            print(completed.stderr.decode().strip().splitlines()[-1])
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", nargs="+", choices=list(ACTION_MODULES), default=list(ACTION_MODULES),
+                        help="actions to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each action, the best one being kept")
+    args = parser.parse_args()
+
+    missed = []
+    for action in args.actions:
+        elapsed = startup_time(action, args.repeat)
+        if elapsed is None:
+            print("%-12s not available" % action)
+            continue
+        status = "ok" if elapsed <= STARTUP_TARGETS[action] else "SLOWER THAN TARGET"
+        if elapsed > STARTUP_TARGETS[action]:
+            missed.append(action)
+        print("%-12s %7.3fs  target %5.2fs  %s" % (action, elapsed, STARTUP_TARGETS[action], status))
+
+    if missed:
+        exit(1)
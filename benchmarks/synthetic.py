@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Synthetic data of the benchmarks : movie catalogs and French transcripts of any size, generated from the
+vocabulary of the transcript bundled with the repository, so that no IMDB dataset nor VOSK model is needed.
+The same seed always gives the same data"""
+import os
+import random
+import re
+import sqlite3
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import init
+
+SAMPLE_TRANSCRIPT = os.path.join(REPO_DIR, "10617-05.02.2022-ITEMA_22923546-2022F12509S0036-22.txt")
+# first names and surnames of the synthetic transcripts, capitalized by the preparse
+NAMES = ["Claire", "Simon", "Carine", "Tardieu", "Fanny", "Laurent", "Christine", "Emmanuelle", "Michel", "Jonas",
+         "Marguerite", "Solange", "Pierre", "Marie", "Jean", "Sophie", "Nicolas", "Julie", "Thomas", "Camille"]
+# sentences of the synthetic transcripts mentioning a film, in the forms caught by the matching rules
+FILM_SENTENCES = ["le film {title} de {name}", "dans ce film {title} {name} met en scène", "on a vu {title} le film",
+                  "le nouveau film de {name} {title} sort mercredi", "ce film {title} est un souvenir"]
+WORDS_PER_LINE = 20
+
+
+def vocabulary():
+    """Words of the bundled transcript, lower case"""
+    with open(SAMPLE_TRANSCRIPT, encoding="utf-8") as f:
+        words = re.findall(r"[\w'-]+", f.read().lower())
+
+    return sorted(set(words))
+
+
+def movie_rows(count, seed=0):
+    """Rows (title, imdbid, translated, rating) of a synthetic movie table. Titles are made of 1 to 5 words of the
+    vocabulary, about one third of them having a translated title"""
+    rng = random.Random(seed)
+    words = vocabulary()
+    for i in range(count):
+        title = " ".join(rng.choice(words) for _ in range(rng.choice([1, 2, 2, 3, 3, 4, 5]))).capitalize()
+        translated = title if rng.random() < 0.66 else \
+            " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))).capitalize()
+        yield title, "tt%07d" % i, translated, round(rng.uniform(1, 10), 1) if rng.random() < 0.8 else -1
+
+
+def write_movie_db(db_file, count, seed=0):
+    """Creates a SQLite DB with the movie table of init.py filled with a synthetic catalog"""
+    if os.path.isfile(db_file):
+        os.remove(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute(init.SQL_MOVIE_TABLE)
+    conn.executemany(init.SQL_INSERT_MOVIE, movie_rows(count, seed))
+    conn.execute(init.SQL_MOVIE_INDEX_IMDB)
+    conn.execute(init.SQL_MOVIE_INDEX_TITLE)
+    conn.execute(init.SQL_MOVIE_INDEX_RATED)
+    conn.execute(init.SQL_MOVIE_FTS)
+    conn.execute(init.SQL_MOVIE_FTS_TERMS)
+    init.normalize_titles(conn)
+    conn.close()
+
+    return db_file
+
+
+def transcript(word_count, titles, seed=0, film_rate=0.05):
+    """A synthetic transcript of about word_count words, as written by the transcription : lower case words, one
+    utterance per line. Titles of the catalog are mentioned in about film_rate of the sentences"""
+    rng = random.Random(seed)
+    words = vocabulary()
+    titles = list(titles)
+
+    text = []
+    while len(text) < word_count:
+        if titles and rng.random() < film_rate:
+            sentence = rng.choice(FILM_SENTENCES).format(title=rng.choice(titles).lower(), name=rng.choice(NAMES))
+            text.extend(sentence.lower().split())
+        elif rng.random() < 0.05:
+            text.append(rng.choice(NAMES).lower())
+        else:
+            text.extend(rng.choice(words) for _ in range(rng.randint(3, 12)))
+
+    return "\n".join(" ".join(text[i:i + WORDS_PER_LINE]) for i in range(0, len(text), WORDS_PER_LINE))
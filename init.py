@@ -2,8 +2,12 @@
 import argparse
 import csv
 import gzip
+import itertools
+import json
 import os
 import sqlite3
+import time
+from contextlib import contextmanager
 from enum import Enum
 from sqlite3 import Error
 from urllib.parse import urlparse
@@ -16,83 +20,317 @@ DB_FILE = "moviedb.db"
 IMDB_URLS = Enum("IMDB_URL", [("TITLES", "https://datasets.imdbws.com/title.basics.tsv.gz"),
                               ("TRANSLATION", "https://datasets.imdbws.com/title.akas.tsv.gz"),
                               ("RATING", "https://datasets.imdbws.com/title.ratings.tsv.gz")])
+# size of the chunks written to disk while downloading a dataset
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# number of rows sent to SQLite with each executemany in bulk mode
+BULK_BATCH_SIZE = 50000
+# pragmas used while bulk loading : no journal on disk and no fsync, the DB must be reloaded if the load is interrupted
+BULK_PRAGMAS = ["PRAGMA journal_mode = MEMORY", "PRAGMA synchronous = OFF", "PRAGMA temp_store = MEMORY",
+                "PRAGMA cache_size = -256000"]
+DEFAULT_PRAGMAS = ["PRAGMA journal_mode = DELETE", "PRAGMA synchronous = FULL"]
+
+SQL_MOVIE_TABLE = """
+    CREATE TABLE movie (
+    id integer PRIMARY KEY AUTOINCREMENT,
+    title text NOT NULL,
+    imdbid text NOT NULL,
+    translated text NOT NULL,
+    rating real DEFAULT -1,
+    translated_folded text,
+    translated_length integer,
+    translated_terms integer
+    );"""
+
+# columns derived from the translated title by normalize_titles(), added to the DB files created before them
+SQL_TITLE_COLUMNS = [("translated_folded", "text"), ("translated_length", "integer"), ("translated_terms", "integer")]
+
+SQL_MOVIE_INDEX_IMDB = """
+    CREATE UNIQUE INDEX idx_movieid
+    ON movie(imdbid);
+    """
+
+SQL_MOVIE_INDEX_TITLE = """
+        CREATE INDEX movie_title_idx
+        ON movie(title);
+        """
+
+# titles read by the parse : rated movies only, longest titles first
+SQL_MOVIE_INDEX_RATED = """
+        CREATE INDEX movie_rated_idx
+        ON movie(translated_length DESC) WHERE rating > 0;
+        """
+
+# full text index of the casefolded titles, the parse fetches the titles whose words are all in the transcript
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+SQL_MOVIE_FTS = """
+        CREATE VIRTUAL TABLE movie_fts
+        USING fts5(translated_folded, content='movie', content_rowid='id', tokenize='%s');
+        """ % FTS_TOKENIZER
+SQL_MOVIE_FTS_TERMS = """
+        CREATE VIRTUAL TABLE movie_fts_terms
+        USING fts5vocab(movie_fts, instance);
+        """
+
+SQL_INSERT_MOVIE = ''' INSERT INTO movie(title, imdbid, translated, rating)
+                  VALUES(?,?,?,?) '''
+SQL_UPDATE_RATING = '''UPDATE movie set rating=? where imdbid=?'''
+# the derived columns of a title translated are computed again by normalize_titles()
+SQL_UPDATE_TRANSLATION = '''UPDATE movie set TRANSLATED=?, translated_folded=NULL, translated_length=NULL
+                            where imdbid=?'''
+
 
 def __download_imdb_dataset(url=IMDB_URLS.TITLES.value):
-    """Download IMDB Dataset and store it"""
+    """Download IMDB Dataset and store it
+    The file is streamed to disk by chunks. An interrupted download is resumed where it stopped (HTTP Range) and a
+    dataset already downloaded is only fetched again when it changed on the server (ETag / Last-Modified), the
+    validators being kept in a .meta file next to the dataset"""
     print("Downloading data...")
     url_parse = urlparse(url)
     filename = os.path.basename(url_parse.path)
-    r = requests.get(url, allow_redirects=True)
 
     if not os.path.isdir(IMDB_DATASET_DIR):
         os.mkdir(IMDB_DATASET_DIR)
     folder_file = IMDB_DATASET_DIR + filename
-    open(folder_file, 'wb').write(r.content)
-
+    part_file = folder_file + ".part"
+    meta_file = folder_file + ".meta"
+
+    metadata = {}
+    if os.path.isfile(meta_file):
+        with open(meta_file) as f:
+            metadata = json.load(f)
+    validator = metadata.get("etag") or metadata.get("last_modified")
+
+    # no transfer compression, the bytes written must be the ones of the file for a range to be resumed
+    headers = {"Accept-Encoding": "identity"}
+    offset = 0
+    if os.path.isfile(part_file) and validator:
+        # resume the download, the server sends the whole file again if it changed in between
+        offset = os.path.getsize(part_file)
+        headers["Range"] = "bytes=%d-" % offset
+        headers["If-Range"] = validator
+    elif os.path.isfile(folder_file):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    with requests.get(url, headers=headers, allow_redirects=True, stream=True) as r:
+        if r.status_code == 304:
+            print("Dataset unchanged")
+            return folder_file
+        if r.status_code == 416:
+            # the part file already holds the whole dataset
+            os.replace(part_file, folder_file)
+            print("Ended")
+            return folder_file
+        r.raise_for_status()
+        if r.status_code == 206 and not r.headers.get("Content-Range", "").startswith("bytes %d-" % offset):
+            # not the range asked for, starting over
+            os.remove(part_file)
+            os.remove(meta_file)
+            return __download_imdb_dataset(url)
+
+        if r.status_code != 206:
+            offset = 0
+            # validators of the file being downloaded, needed to resume it
+            metadata = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+            with open(meta_file, "w") as f:
+                json.dump(metadata, f)
+
+        with open(part_file, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            f.truncate()
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+            size = f.tell()
+
+        # a connection closed early is not always reported, the part file is kept to resume the download later on
+        if "Content-Length" in r.headers and size != offset + int(r.headers["Content-Length"]):
+            raise requests.exceptions.ConnectionError("Download of %s interrupted at %d bytes, run again to resume"
+                                                      % (url, size))
+
+    os.replace(part_file, folder_file)
     print("Ended")
 
     return folder_file
 
 
-def loadtranslatedtitles_imdb():
-    """Downloads and loads translated movie titles from IMDB downloaded dataset"""
-    tsv_filename = __download_imdb_dataset(IMDB_URLS.TRANSLATION.value)
+@contextmanager
+def __open_imdb_dataset(url, stream=False):
+    """Open an IMDB dataset as text. In stream mode, the HTTP response is decompressed on the fly and goes straight
+    to the loader, without writing the dataset to disk"""
+    if stream:
+        print("Streaming data...")
+        with requests.get(url, allow_redirects=True, stream=True) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            with gzip.open(r.raw, "rt") as csvfile:
+                yield csvfile
+    else:
+        with gzip.open(__download_imdb_dataset(url), "rt") as csvfile:
+            yield csvfile
+
+
+def __bulk_load(conn, sql, rows, drop_indexes=(), create_indexes=()):
+    """Bulk load : executes the SQL statement over the rows by batches, in a single transaction, with the load-time
+    pragmas. The indexes given are dropped before the load and created once all the rows are in the table, within
+    the same transaction : when an index cannot be created (duplicate imdbid for the unique index), the load is
+    rolled back and the error raised, the table and its indexes being left as they were"""
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    try:
+        conn.execute("BEGIN")
+        for index_name in drop_indexes:
+            conn.execute("DROP INDEX IF EXISTS " + index_name)
+
+        start = time.perf_counter()
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, BULK_BATCH_SIZE))
+            if not batch:
+                break
+            conn.executemany(sql, batch)
+            count += len(batch)
+            print("%d rows..." % count, end="\r", flush=True)
+        elapsed = time.perf_counter() - start
+        print("%d rows loaded in %.1fs (%d rows/sec)" % (count, elapsed, count / elapsed if elapsed > 0 else count))
+
+        if create_indexes:
+            print("Creating indexes...")
+            start = time.perf_counter()
+            for create_index_sql in create_indexes:
+                conn.execute(create_index_sql)
+            print("Indexes created in %.1fs" % (time.perf_counter() - start))
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        for pragma in DEFAULT_PRAGMAS:
+            conn.execute(pragma)
+
+    return count
+
+
+def normalize_titles(conn):
+    """Computes the derived columns of the titles inserted or translated since the last call : casefolded title, its
+    length and its number of words for the full text index, which is rebuilt. Returns the number of titles updated"""
+    start = time.perf_counter()
+    conn.create_function("casefold", 1, str.casefold, deterministic=True)
+    count = conn.execute("""UPDATE movie SET translated_folded = casefold(translated),
+                            translated_length = length(translated), translated_terms = NULL
+                            WHERE translated_folded IS NULL""").rowcount
+    if count:
+        print("Indexing %d titles..." % count)
+        conn.execute("INSERT INTO movie_fts(movie_fts) VALUES('rebuild')")
+        # distinct words of each title, counted once over the whole full text index
+        conn.execute("CREATE TEMP TABLE title_terms (id integer PRIMARY KEY, terms integer)")
+        conn.execute("INSERT INTO temp.title_terms SELECT doc, count(DISTINCT term) FROM movie_fts_terms GROUP BY doc")
+        conn.execute("""UPDATE movie SET translated_terms = coalesce((SELECT terms FROM temp.title_terms
+                                                                       WHERE title_terms.id = movie.id), 0)
+                        WHERE translated_terms IS NULL""")
+        conn.execute("DROP TABLE temp.title_terms")
+    conn.commit()
+    print("%d titles normalized in %.1fs" % (count, time.perf_counter() - start))
+
+    return count
+
+
+def __upgrade_schema(conn):
+    """Adds the derived title columns, the index of the rated titles and the full text index to a DB created before
+    them, the titles being left to normalize_titles()"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(movie)")]
+    for column, column_type in SQL_TITLE_COLUMNS:
+        if column not in columns:
+            print("Adding column %s..." % column)
+            conn.execute("ALTER TABLE movie ADD COLUMN %s %s" % (column, column_type))
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master")]
+    if "movie_rated_idx" not in tables:
+        create_index(conn, SQL_MOVIE_INDEX_RATED)
+    for name, create_sql in [("movie_fts", SQL_MOVIE_FTS), ("movie_fts_terms", SQL_MOVIE_FTS_TERMS)]:
+        if name not in tables:
+            create_table(conn, create_sql)
+    conn.commit()
+
+
+def migrate(conn):
+    """Upgrades a DB created before the derived title columns : adds the columns, the index of the rated titles and
+    the full text index, then fills them"""
+    __upgrade_schema(conn)
+
+    return normalize_titles(conn)
 
+
+def loadtranslatedtitles_imdb(bulk=False, stream=False):
+    """Downloads and loads translated movie titles from IMDB downloaded dataset"""
     # Open connection
     conn = create_connection(DB_FILE)
+    # a DB created before the normalized titles gets their columns before the load writes them
+    __upgrade_schema(conn)
 
-    with gzip.open(tsv_filename, "rt") as csvfile:
+    with __open_imdb_dataset(IMDB_URLS.TRANSLATION.value, stream) as csvfile:
         # with open(input_tsv_file, newline='') as csvfile:
         csvreader = csv.DictReader(csvfile, delimiter='\t', quoting=csv.QUOTE_NONE)
         print("Updating data...")
-        for row in csvreader:
-            # if row["region"] == "FR" and row["language"] == "fr":
-            if row["region"] == "FR":
-                # Execute a SQL INSERT command
-                movietranslation = (row["title"], row["titleId"])
+        # if row["region"] == "FR" and row["language"] == "fr":
+        movietranslations = ((row["title"], row["titleId"]) for row in csvreader if row["region"] == "FR")
+        if bulk:
+            __bulk_load(conn, SQL_UPDATE_TRANSLATION, movietranslations)
+        else:
+            for movietranslation in movietranslations:
+                # Execute a SQL UPDATE command
                 update_translation(conn, movietranslation)
 
         conn.commit()
+    normalize_titles(conn)
     print("Ended")
 
 
-def loadrating_imdb():
+def loadrating_imdb(bulk=False, stream=False):
     """Downloads and loads movie ratings from IMDB downloaded dataset"""
-    tsv_filename = __download_imdb_dataset(IMDB_URLS.RATING.value)
-
     # Open connection
     conn = create_connection(DB_FILE)
 
-    with gzip.open(tsv_filename, "rt") as csvfile:
+    with __open_imdb_dataset(IMDB_URLS.RATING.value, stream) as csvfile:
         csvreader = csv.DictReader(csvfile, delimiter='\t', quoting=csv.QUOTE_NONE)
         print("Updating data...")
-        for row in csvreader:
-            # Execute a SQL UPDATE command
-            movierating = (row["averageRating"], row["tconst"])
-            update_ratings(conn, movierating)
+        movieratings = ((row["averageRating"], row["tconst"]) for row in csvreader)
+        if bulk:
+            __bulk_load(conn, SQL_UPDATE_RATING, movieratings)
+        else:
+            for movierating in movieratings:
+                # Execute a SQL UPDATE command
+                update_ratings(conn, movierating)
 
         conn.commit()
     print("Ended")
 
 
-def loadmovies_imdb():
+def loadmovies_imdb(bulk=False, stream=False):
     """Downloads and loads movie from IMDB downloaded dataset"""
-    tsv_filename = __download_imdb_dataset()
-
     # Open connection
     conn = create_connection(DB_FILE)
+    # a DB created before the normalized titles gets their columns before the load writes them
+    __upgrade_schema(conn)
 
-    with gzip.open(tsv_filename, "rt") as csvfile:
+    with __open_imdb_dataset(IMDB_URLS.TITLES.value, stream) as csvfile:
         # with open(input_tsv_file, newline='') as csvfile:
         csvreader = csv.DictReader(csvfile, delimiter='\t')
         print("Inserting data...")
-        for row in csvreader:
-            if row["titleType"] == "movie":
+        movies = ((row["originalTitle"], row["tconst"], row["originalTitle"], -1)
+                  for row in csvreader if row["titleType"] == "movie")
+        if bulk:
+            # the indexes are built once the table is loaded, rather than maintained row by row
+            __bulk_load(conn, SQL_INSERT_MOVIE, movies, ["idx_movieid", "movie_title_idx"],
+                        [SQL_MOVIE_INDEX_IMDB, SQL_MOVIE_INDEX_TITLE])
+        else:
+            for movie in movies:
                 # Execute a SQL INSERT command
-                movie = (row["originalTitle"], row["tconst"], row["originalTitle"], -1)
                 create_movie(conn, movie)
 
         conn.commit()
+    normalize_titles(conn)
     print("Ended")
 
 
@@ -129,26 +367,20 @@ def create_index(conn, create_index_sql):
 
 
 def create_movie(conn, movie):
-    sql = ''' INSERT INTO movie(title, imdbid, translated, rating)
-                  VALUES(?,?,?,?) '''
     cur = conn.cursor()
-    cur.execute(sql, movie)
+    cur.execute(SQL_INSERT_MOVIE, movie)
     conn.commit()
 
 
 def update_ratings(conn, movierating):
-    sql = '''UPDATE movie set rating=? where imdbid=?'''
-
     cur = conn.cursor()
-    cur.execute(sql, movierating)
+    cur.execute(SQL_UPDATE_RATING, movierating)
     conn.commit()
 
 
 def update_translation(conn, movie):
-    sql = '''UPDATE movie set TRANSLATED=? where imdbid=?'''
-
     cur = conn.cursor()
-    cur.execute(sql, movie)
+    cur.execute(SQL_UPDATE_TRANSLATION, movie)
     conn.commit()
 
 
@@ -157,37 +389,29 @@ if __name__ == '__main__':
     parser.add_argument("--action", help="initdb : initialize SQLITE DB"
                                          "imdbmovie : load IMDB movie dataset, "
                                          "imdbtranslate : load IMDB translated titles "
-                                         "imdbratings : loads IMDB rating", required=True)
+                                         "imdbratings : loads IMDB rating, "
+                                         "migrate : upgrade a DB created without the normalized titles",
+                        required=True)
+    parser.add_argument("--bulk", action="store_true", help="bulk load : batched inserts/updates in a single "
+                                                             "transaction, without journal nor fsync")
+    parser.add_argument("--stream", action="store_true", help="load the IMDB dataset while it is downloaded, "
+                                                               "without storing it on disk")
     args = parser.parse_args()
 
-    sql_movie_table = """
-    CREATE TABLE movie (
-    id integer PRIMARY KEY AUTOINCREMENT,
-    title text NOT NULL,
-    imdbid text NOT NULL,
-    translated text NOT NULL,
-    rating real DEFAULT -1
-    );"""
-
-    sql_movie_index_imdb = """
-    CREATE UNIQUE INDEX idx_movieid
-    ON movie(imdbid);
-    """
-
-    sql_movie_index_title = """
-        CREATE INDEX movie_title_idx
-        ON movie(title);
-        """
-
     if args.action == "initdb":
         db_connection = create_connection(DB_FILE)
-        create_table(db_connection, sql_movie_table)
-        create_index(db_connection, sql_movie_index_imdb)
-        create_index(db_connection, sql_movie_index_title)
+        create_table(db_connection, SQL_MOVIE_TABLE)
+        create_index(db_connection, SQL_MOVIE_INDEX_IMDB)
+        create_index(db_connection, SQL_MOVIE_INDEX_TITLE)
+        create_index(db_connection, SQL_MOVIE_INDEX_RATED)
+        create_table(db_connection, SQL_MOVIE_FTS)
+        create_table(db_connection, SQL_MOVIE_FTS_TERMS)
 
     if args.action == "imdbmovie":
-        loadmovies_imdb()
+        loadmovies_imdb(args.bulk, args.stream)
     if args.action == "imdbtranslate":
-        loadtranslatedtitles_imdb()
+        loadtranslatedtitles_imdb(args.bulk, args.stream)
     if args.action == "imdbratings":
-        loadrating_imdb()
\ No newline at end of file
+        loadrating_imdb(args.bulk, args.stream)
+    if args.action == "migrate":
+        migrate(create_connection(DB_FILE))
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""Podcast analyzer : transcribes the episodes of a podcast and finds the films they talk about
+Each action lives in its own module (download, convert, transcribe, preparse, parse), imported by the command line
+only when the action is run, so that an action does not pay the import of the libraries of the others"""
+__version__ = "0.1.0"
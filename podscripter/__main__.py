@@ -0,0 +1,129 @@
+"""Command line of podscripter : python -m podscripter --action ...
+The module of an action is imported only when the action is run, --help and the light actions start without
+loading spaCy, VOSK or numpy"""
+import argparse
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="podscripter")
+
+    parser.add_argument("--action", choices=["download", "convert", "transcribe", "stream", "preparse", "parse", "all",
+                                             "ingest", "service"],
+                        help="download : new episodes of a feed, convert : chunk file, transcribe : transcribe into "
+                             "text the result of conversion, stream : transcribe an MP3 in a single pass, preparse : "
+                             "capitalize the names of a transcribed file, parse : films of a transcribed file, all : "
+                             "convert, transcribe, preparse and parse a file, ingest : download and parse the new "
+                             "episodes of a feed as a pipeline, service : local HTTP service running episodes as "
+                             "jobs", required=True)
+    parser.add_argument("--file", help="MP3 to transcript", required="--convert" in sys.argv or "--all" in sys.argv)
+    parser.add_argument("--chunkfolder", help="folder containing chunks", required="--transcript" in sys.argv)
+    parser.add_argument("--transcribedfile", help="file to pre-parse",
+                        required="--preparse" in sys.argv or "--parse" in sys.argv)
+    parser.add_argument("--xmlfeedurl", help="Feed URL XML format", required="--download" in sys.argv)
+    parser.add_argument("--tagging", action="store_true", help="Spacy tagging in output")
+    parser.add_argument("--workers", type=int, default=1, help="number of transcription processes, each one loading "
+                                                                "its own VOSK model")
+    parser.add_argument("--timestamps", action="store_true", help="time of each utterance in the text file, "
+                                                                  "with the stream action")
+    parser.add_argument("--profile", help="JSON report of the time, CPU and memory used by each stage of the action")
+    parser.add_argument("--downloads", type=int, help="number of episodes downloaded at the same time (4 by default)")
+    parser.add_argument("--batch", help="folder or glob pattern of transcribed files to preparse or parse together, "
+                                        "instead of --transcribedfile")
+    parser.add_argument("--batchsize", type=int, help="number of transcribed files tagged together by spacy in batch "
+                                                      "mode (16 by default)")
+    parser.add_argument("--nprocess", type=int, default=1, help="number of spacy tagging processes in batch mode")
+    parser.add_argument("--distance", type=int, help="edits allowed between a title and the transcribed text, for "
+                                                     "the titles mangled by the transcription (0 by default, exact "
+                                                     "matches only)")
+    parser.add_argument("--concurrency", nargs="+", metavar="STAGE=N", help="workers of the stages of the ingest "
+                                                                             "action (download, convert, transcribe, "
+                                                                             "parse), e.g. transcribe=3")
+    parser.add_argument("--port", type=int, help="port of the service action (8750 by default)")
+    parser.add_argument("--window", type=int, help="preparse or parse a long transcribed file by windows of about "
+                                                   "this number of words, with a bounded memory")
+    parser.add_argument("--targeted", action="store_true", help="parse with the titles of the DB whose words are all "
+                                                                "in the transcribed file only, fetched with the full "
+                                                                "text index instead of the title index (exact "
+                                                                "matches only)")
+
+    args = parser.parse_args()
+    # no worker would download the episodes
+    if args.downloads is not None and args.downloads < 1:
+        parser.error("--downloads expects a number of episodes of at least 1, not %d" % args.downloads)
+    # a window of no word would be taken as no window at all
+    if args.window is not None and args.window < 1:
+        parser.error("--window expects a number of words of at least 1, not %d" % args.window)
+    if args.targeted and (args.batch or args.window):
+        # the batch and windowed modes share the title index compiled from the whole DB
+        parser.error("--targeted parses a single transcribed file, it cannot be combined with --batch nor --window")
+    if args.profile:
+        from . import profiling
+        profiling.enable()
+
+    if args.action == "convert":
+        from .convert import conversion
+        conversion(args.file)
+
+    if args.action == "transcribe":
+        from .transcribe import transcription
+        transcription(args.chunkfolder, args.workers)
+
+    if args.action == "stream":
+        from .transcribe import stream_transcription
+        print(stream_transcription(args.file, args.timestamps))
+
+    if args.action == "preparse":
+        from .preparse import preparse, preparse_batch, preparse_windowed
+        if args.batch:
+            print(preparse_batch(args.batch, args.batchsize, args.nprocess))
+        elif args.window:
+            print(preparse_windowed(args.transcribedfile, args.window))
+        else:
+            print(preparse(args.transcribedfile))
+
+    if args.action == "parse":
+        from .parse import parse, parse_batch, parse_windowed
+        if args.batch:
+            print(parse_batch(args.batch, args.batchsize, args.nprocess, args.tagging, args.distance))
+        elif args.window:
+            print(parse_windowed(args.transcribedfile, args.window, args.tagging, args.distance))
+        else:
+            print(parse(args.transcribedfile, args.tagging, args.distance, args.targeted))
+
+    if args.action == "download":
+        from .download import download_rss_feed
+        download_rss_feed(args.xmlfeedurl, args.downloads)
+
+    if args.action == "ingest":
+        from .pipeline import STAGES, ingest
+        workers = {}
+        for item in args.concurrency or []:
+            stage, _, count = item.partition("=")
+            # a stage without workers would hold the pipeline forever
+            if stage not in STAGES or not count.isdigit() or int(count) < 1:
+                parser.error("--concurrency expects STAGE=N, STAGE among %s and N at least 1, not %r"
+                             % (", ".join(STAGES), item))
+            workers[stage] = int(count)
+        print(ingest(args.xmlfeedurl, workers))
+
+    if args.action == "service":
+        from .service import SERVICE_PORT, serve
+        serve(args.port or SERVICE_PORT)
+
+    if args.action == "all":
+        from .convert import conversion
+        from .parse import parse
+        from .preparse import preparse
+        from .transcribe import transcription
+        chunk_folder = conversion(args.file)
+        transcribed_file = transcription(chunk_folder, args.workers)
+        print(preparse(transcribed_file))
+        print(parse(transcribed_file, args.tagging, args.distance, args.targeted))
+
+    if args.profile:
+        profiling.write_report(args.profile)
+
+
+if __name__ == '__main__':
+    main()
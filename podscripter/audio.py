@@ -0,0 +1,65 @@
+"""Audio helpers shared by the convert, transcribe and stream actions, in the format expected by VOSK"""
+import os
+import subprocess
+import sys
+import wave
+
+SAMPLE_RATE = 16000
+# size in bytes of the PCM blocks given to the recognizer (one second of 16 bits mono audio)
+PCM_BLOCK_SIZE = SAMPLE_RATE * 2
+
+
+def pcm_blocks(audiofile_path):
+    """Yields the audio of a file as blocks of PCM in the recognizer format (16 kHz, mono, 16 bits)
+    WAV files already in this format, like the chunks written by the converter, are read in-process, other audio
+    files are decoded and resampled on the fly through ffmpeg"""
+    try:
+        with wave.open(audiofile_path, "rb") as wave_file:
+            if wave_file.getnchannels() == 1 and wave_file.getsampwidth() == 2 \
+                    and wave_file.getframerate() == SAMPLE_RATE and wave_file.getcomptype() == "NONE":
+                while True:
+                    data = wave_file.readframes(PCM_BLOCK_SIZE // 2)
+                    if len(data) == 0:
+                        return
+                    yield data
+    except (wave.Error, EOFError):
+        pass
+
+    process = subprocess.Popen(['ffmpeg', '-loglevel', 'quiet', '-i',
+                                audiofile_path,
+                                '-ar', str(SAMPLE_RATE), '-ac', '1', '-f', 's16le', '-'],
+                               stdout=subprocess.PIPE)
+    with process:
+        while True:
+            data = process.stdout.read(PCM_BLOCK_SIZE)
+            if len(data) == 0:
+                break
+            else:
+                yield data
+
+
+def sound_convert_to_wav(mp3_filepath):
+    """converts MP3 to WAV (needed by VOSK)
+    The MP3 is decoded once by ffmpeg, straight to the native format of the recognizer (16 kHz, mono, 16 bits),
+    which is then kept by the chunks and given as is to VOSK"""
+    filename, file_extension = os.path.splitext(mp3_filepath)
+    wav_file_path = filename + ".wav"
+    # convert mp3 to wav
+    subprocess.run(['ffmpeg', '-loglevel', 'quiet', '-y', '-i',
+                    mp3_filepath,
+                    '-ar', str(SAMPLE_RATE), '-ac', '1', '-acodec', 'pcm_s16le', wav_file_path],
+                   check=True)
+
+    return wav_file_path
+
+
+def progress(count, total, status=''):
+    """Displays a progress bar"""
+    bar_len = 60
+    filled_len = int(round(bar_len * count / float(total)))
+
+    percents = round(100.0 * count / float(total), 1)
+    bar = '=' * filled_len + '-' * (bar_len - filled_len)
+
+    sys.stdout.write('[%s] %s%s ...%s\r' % (bar, percents, '%', status))
+    sys.stdout.flush()
@@ -0,0 +1,233 @@
+"""convert action : an episode converted to WAV and split on silences into chunks for the transcription"""
+import math
+import os
+import struct
+import wave
+
+import numpy as np
+
+from . import profiling
+from .audio import SAMPLE_RATE, progress, sound_convert_to_wav
+
+AUDIO_CHUNKS_FOLDER = "audio-chunks"
+# duration in ms of the blocks of samples processed at once when looking for silences
+SILENCE_BLOCK_MS = 60000
+
+
+def __wav_samples(wav_file):
+    """Memory-map the samples of a 16 bits PCM WAV file. Returns an array of shape (frames, channels) and the
+    frame rate"""
+    with open(wav_file, "rb") as f:
+        riff, riff_size, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError("%s is not a WAV file" % wav_file)
+        wave_format = None
+        # going through the RIFF chunks up to the samples
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError("No data in %s" % wav_file)
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            chunk_data = f.read(chunk_size + chunk_size % 2)
+            if chunk_id == b"fmt ":
+                wave_format = struct.unpack("<HHIIHH", chunk_data[:16])
+
+    # 1 : PCM, 0xFFFE : extensible format, used by ffmpeg for more than 2 channels
+    if wave_format is None or wave_format[0] not in (1, 0xFFFE) or wave_format[5] != 16:
+        raise ValueError("%s is not a 16 bits PCM WAV file" % wav_file)
+    audio_format, channels, frame_rate, byte_rate, block_align, bits_per_sample = wave_format
+    # the size of the data chunk is not always set by the encoders writing to a pipe
+    frame_count = min(chunk_size, os.path.getsize(wav_file) - data_offset) // block_align
+    if frame_count == 0:
+        return np.zeros((0, channels), dtype="<i2"), frame_rate
+
+    return np.memmap(wav_file, dtype="<i2", mode="r", offset=data_offset, shape=(frame_count, channels)), frame_rate
+
+
+def __dbfs(samples, frame_rate):
+    """Loudness of the samples in dBFS, as pydub AudioSegment.dBFS, computed block by block"""
+    sum_squares = 0.0
+    block_frames = SILENCE_BLOCK_MS * frame_rate // 1000
+    for start in range(0, len(samples), block_frames):
+        block = samples[start:start + block_frames].astype(np.float64)
+        sum_squares += float(np.einsum("ij,ij->", block, block))
+    # the RMS is truncated to an integer, as in audioop
+    rms = math.floor(math.sqrt(sum_squares / samples.size)) if samples.size else 0
+    if rms == 0:
+        return -float("inf")
+
+    return 20 * math.log(rms / 32768, 10)
+
+
+def __detect_silence(samples, frame_rate, min_silence_len, silence_thresh):
+    """Same as pydub.silence.detect_silence (seek_step of 1 ms) : returns the [start, end] ranges in ms made of
+    windows of min_silence_len ms whose RMS is under silence_thresh dBFS.
+    The energy of each ms is computed with NumPy, block by block, the windows being summed from cumulative sums. Only
+    the last min_silence_len ms of a block are carried to the next one, memory does not grow with the file"""
+    seg_len = int(round(1000 * len(samples) / frame_rate))
+    if seg_len < min_silence_len:
+        return []
+
+    channels = samples.shape[1]
+    # comparing mean squares rather than RMS, the RMS being truncated to an integer as in audioop :
+    # int(rms) <= thresh <=> mean square < (int(thresh) + 1)^2
+    threshold = (math.floor(10 ** (silence_thresh / 20) * 32768) + 1) ** 2
+    silent_ranges = []
+    # silence being extended : [first window start, last window start]
+    current_range = None
+    carry_energy = np.zeros(0)
+    carry_count = np.zeros(0)
+
+    for block_start in range(0, seg_len, SILENCE_BLOCK_MS):
+        block_end = min(block_start + SILENCE_BLOCK_MS, seg_len)
+        # energy and number of samples of each ms of the block
+        bounds = np.minimum(np.arange(block_start, block_end + 1) * frame_rate // 1000, len(samples))
+        block = samples[bounds[0]:bounds[-1]].astype(np.float64)
+        cumulative_block = np.concatenate(([0.0], np.cumsum(np.einsum("ij,ij->i", block, block))))
+        energy = np.concatenate((carry_energy, np.diff(cumulative_block[bounds - bounds[0]])))
+        count = np.concatenate((carry_count, np.diff(bounds) * channels))
+        carry_energy = energy[len(energy) - min_silence_len + 1:]
+        carry_count = count[len(count) - min_silence_len + 1:]
+        if len(energy) < min_silence_len:
+            continue
+
+        # windows of min_silence_len ms, starting from the first ms carried
+        cumulative_energy = np.concatenate(([0.0], np.cumsum(energy)))
+        cumulative_count = np.concatenate(([0], np.cumsum(count)))
+        window_energy = cumulative_energy[min_silence_len:] - cumulative_energy[:-min_silence_len]
+        window_count = cumulative_count[min_silence_len:] - cumulative_count[:-min_silence_len]
+        silence_starts = np.flatnonzero(window_energy < threshold * window_count) + block_end - len(energy)
+        if len(silence_starts) == 0:
+            continue
+
+        # windows closer than min_silence_len belong to the same silence
+        gaps = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+        for first_start, last_start in zip(silence_starts[np.concatenate(([0], gaps + 1))],
+                                           silence_starts[np.concatenate((gaps, [len(silence_starts) - 1]))]):
+            if current_range is not None and first_start <= current_range[1] + min_silence_len:
+                current_range[1] = int(last_start)
+            else:
+                if current_range is not None:
+                    silent_ranges.append([current_range[0], current_range[1] + min_silence_len])
+                current_range = [int(first_start), int(last_start)]
+
+    if current_range is not None:
+        silent_ranges.append([current_range[0], current_range[1] + min_silence_len])
+
+    return silent_ranges
+
+
+def __split_on_silence(samples, frame_rate, min_silence_len, silence_thresh, keep_silence):
+    """Same as pydub.silence.split_on_silence, but returns the (start, end) frame offsets of the chunks instead of
+    copies of the audio. The length of the audio being rounded to the ms, the last chunk may end after the last frame :
+    pydub pads it with up to 2 ms of silence, the chunk stops at the last frame here"""
+    seg_len = int(round(1000 * len(samples) / frame_rate))
+    silent_ranges = __detect_silence(samples, frame_rate, min_silence_len, silence_thresh)
+
+    # non silent ranges, as pydub.silence.detect_nonsilent
+    if not silent_ranges:
+        nonsilent_ranges = [[0, seg_len]]
+    elif silent_ranges[0] == [0, seg_len]:
+        nonsilent_ranges = []
+    else:
+        nonsilent_ranges = []
+        prev_end = 0
+        for start, end in silent_ranges:
+            nonsilent_ranges.append([prev_end, start])
+            prev_end = end
+        if silent_ranges[-1][1] != seg_len:
+            nonsilent_ranges.append([prev_end, seg_len])
+        if nonsilent_ranges[0] == [0, 0]:
+            nonsilent_ranges.pop(0)
+
+    # keeping some silence around each chunk, overlapping ranges are split in the middle
+    output_ranges = [[start - keep_silence, end + keep_silence] for start, end in nonsilent_ranges]
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+
+    return [(max(start, 0) * frame_rate // 1000, min(min(end, seg_len) * frame_rate // 1000, len(samples)))
+            for start, end in output_ranges]
+
+
+def __write_wav_chunk(chunk_filename, samples, frame_rate):
+    """Write a chunk in the native format of the recognizer (16 kHz, mono, 16 bits). The converter already produces
+    this format, the samples are then written as is, WAV files coming from elsewhere are resampled"""
+    if samples.shape[1] == 1 and frame_rate == SAMPLE_RATE:
+        with wave.open(chunk_filename, "wb") as wave_file:
+            wave_file.setnchannels(1)
+            wave_file.setsampwidth(2)
+            wave_file.setframerate(SAMPLE_RATE)
+            wave_file.writeframes(samples.astype("<i2", copy=False).tobytes())
+    else:
+        # pydub is only needed for these files, it is not imported by the other conversions
+        from pydub import AudioSegment
+
+        audio_chunk = AudioSegment(data=samples.astype("<i2", copy=False).tobytes(), sample_width=2,
+                                   frame_rate=frame_rate, channels=samples.shape[1])
+        audio_chunk = audio_chunk.set_frame_rate(SAMPLE_RATE).set_channels(1)
+        audio_chunk.export(chunk_filename, format="wav")
+
+
+def __chunk_wav_file(wav_file, folder=AUDIO_CHUNKS_FOLDER):
+    """Splitting the large audio file into chunks
+    The WAV file is memory-mapped and the chunks are written from views of it, the whole episode is never loaded
+    in memory. Returns the (start, end) frame offsets of the chunks"""
+    samples, frame_rate = __wav_samples(wav_file)
+    # split audio sound where silence is 800 miliseconds or more and get chunks
+    print("Splitting file...")
+    chunk_bounds = __split_on_silence(samples, frame_rate,
+                                      # experiment with this value for your target audio file
+                                      min_silence_len=800,
+                                      # adjust this per requirement
+                                      silence_thresh=__dbfs(samples, frame_rate) - 14,
+                                      # keep the silence for 100 ms, adjustable as well
+                                      keep_silence=100,
+                                      )
+    # create a directory to store the audio chunks
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+
+    # process each chunk
+    for i, (start, end) in enumerate(chunk_bounds, start=1):
+        # export audio chunk and save it in
+        # the `folder_name` directory.
+        progress(i, len(chunk_bounds), "Writing chunks")
+        chunk_filename = os.path.join(folder, f"chunk{i:04}.wav")
+        __write_wav_chunk(chunk_filename, samples[start:end], frame_rate)
+
+    print("Ended")
+
+    return chunk_bounds
+
+
+def __speed_change(audiofile, speed=1.0):
+    """Change the speed of an audio file to improve voice capture by VOSK"""
+    # Manually override the frame_rate. This tells the computer how many
+    # samples to play per second
+    sound_with_altered_frame_rate = audiofile._spawn(audiofile.raw_data, overrides={
+        "frame_rate": int(audiofile.frame_rate * speed)
+    })
+
+    # convert the sound with altered frame rate to a standard frame rate
+    # so that regular playback programs will work right. They often only
+    # know how to play audio at standard frame rate (like 44.1k)
+    return sound_with_altered_frame_rate.set_frame_rate(audiofile.frame_rate)
+
+
+def conversion(sound_file_path):
+    """Convert MP3 to WAV file (16 kHz mono) and split on silence. Returns the folder of the chunks"""
+    chunks = []
+    with profiling.stage("conversion"):
+        with profiling.stage("ffmpeg"):
+            wav_file = sound_convert_to_wav(sound_file_path)
+        folder = os.path.splitext(sound_file_path)[0]
+        with profiling.stage("chunking") as counts:
+            chunks = __chunk_wav_file(wav_file, folder)
+            counts["chunks"] = len(chunks)
+
+    return folder
@@ -0,0 +1,124 @@
+"""download action : episodes of a podcast fetched from its RSS feed"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+PODCAST_DIR = "podcasts/"
+# GUIDs of the episodes already downloaded from the feeds
+SEEN_EPISODES_FILE = PODCAST_DIR + "seen.json"
+# number of episodes downloaded at the same time, over the connections of a single session
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# seconds without data from the server before giving up an episode
+DOWNLOAD_TIMEOUT = 60
+
+
+def load_seen_episodes(seen_file=SEEN_EPISODES_FILE):
+    """GUIDs of the episodes already downloaded from the feeds (or recorded in another file of GUIDs)"""
+    if not os.path.isfile(seen_file):
+        return set()
+    with open(seen_file) as f:
+        return set(json.load(f))
+
+
+def save_seen_episodes(seen, seen_file=SEEN_EPISODES_FILE):
+    """Store the GUIDs of the episodes already downloaded, through a temporary file not to lose them on a crash"""
+    with open(seen_file + ".tmp", "w") as f:
+        json.dump(sorted(seen), f)
+    os.replace(seen_file + ".tmp", seen_file)
+
+
+def download_episode(session, url, folder_file):
+    """Stream an episode to a .part file, renamed once complete : a file of PODCAST_DIR is always a whole episode"""
+    part_file = folder_file + ".part"
+    with session.get(url, allow_redirects=True, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        r.raise_for_status()
+        with open(part_file, "wb") as f:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+            size = f.tell()
+
+        # a connection closed early is not always reported
+        if "Content-Length" in r.headers and "Content-Encoding" not in r.headers \
+                and size != int(r.headers["Content-Length"]):
+            raise requests.exceptions.ConnectionError("Download of %s interrupted at %d bytes" % (url, size))
+
+    os.replace(part_file, folder_file)
+
+    return folder_file
+
+
+def feed_episodes(xml_feed_url):
+    """Episodes of the feed, as {guid: (url, file)}, file being where the episode is downloaded in PODCAST_DIR"""
+    feed = feedparser.parse(xml_feed_url)
+
+    if not os.path.isdir(PODCAST_DIR):
+        os.mkdir(PODCAST_DIR)
+
+    episodes = {}
+    for entry in feed.entries:
+        url = entry.links[1].href
+        guid = entry.get("id", url)
+        url_parse = urlparse(url)
+        filename = os.path.basename(url_parse.path)
+
+        episodes[guid] = (url, PODCAST_DIR + filename)
+
+    return episodes
+
+
+def new_episodes(xml_feed_url, seen):
+    """Episodes of the feed not downloaded yet, as {guid: (url, file)}. The episodes found in PODCAST_DIR, downloaded
+    by a run that has not recorded them, are added to the seen GUIDs"""
+    episodes = {}
+    for guid, (url, folder_file) in feed_episodes(xml_feed_url).items():
+        if guid in seen:
+            continue
+        if os.path.isfile(folder_file):
+            # already downloaded, by a run that has not recorded it
+            seen.add(guid)
+        else:
+            episodes[guid] = (url, folder_file)
+
+    return episodes
+
+
+def download_session(workers):
+    """Session whose connections to the server are shared by the download threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def download_rss_feed(xml_feed_url, workers=None):
+    """Download MP3 of an audio podcast coming from RSS feed
+    Episodes are downloaded by a pool of threads (DOWNLOAD_WORKERS by default) sharing the connections of one
+    session. The GUIDs of the episodes downloaded are kept in SEEN_EPISODES_FILE, so that polling the feed again
+    only fetches the new ones"""
+    if workers is None:
+        workers = DOWNLOAD_WORKERS
+    seen = load_seen_episodes()
+    episodes = new_episodes(xml_feed_url, seen)
+
+    print("%d episode(s) to download" % len(episodes))
+    with download_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(download_episode, session, url, folder_file): guid
+                       for guid, (url, folder_file) in episodes.items()}
+            try:
+                for future in as_completed(futures):
+                    print(future.result())
+                    seen.add(futures[future])
+            finally:
+                # the episodes downloaded before an error are not fetched again
+                save_seen_episodes(seen)
+
+    return len(episodes)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Approximate title index used to catch the titles mangled by the transcription ("la ventura" for L'Avventura).
+Titles are reduced to a key (casefolded, without accents, spaces nor punctuation) and indexed SymSpell-style : every
+string obtained by deleting up to max_distance characters from the prefix of a key points to its title. Two keys
+within max_distance edits share such a deletion, so the titles close to some words of the text are found with a
+few lookups, whatever the size of the movie table, then checked with an edit distance.
+The deletions are stored as a sorted array of 64-bit entries (CRC32 of the deletion, title index) in a single
+file next to the SQLite DB, memory-mapped when parsing."""
+import array
+import bisect
+import unicodedata
+import zlib
+
+from . import indexfile
+from .indexfile import close_index_file, open_index_file, write_index_file
+
+INDEX_MAGIC = b"PODFIDX1"
+INDEX_VERSION = 1
+
+
+def normalize(text):
+    """Key of a title or of words of the text : casefolded, without accents, spaces nor punctuation"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+
+    return "".join(filter(str.isalnum, decomposed))
+
+
+def deletions(key, distance):
+    """Strings obtained by deleting up to distance characters from the key, the key included"""
+    results = {key}
+    level = {key}
+    for _ in range(distance):
+        level = {word[:i] + word[i + 1:] for word in level for i in range(len(word))}
+        results |= level
+
+    return results
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance between two strings, None when it is over max_distance. The common prefix and suffix
+    are skipped and only the cells of the table within max_distance of its diagonal are computed"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < len(a) - prefix and suffix < len(b) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    if not a or not b:
+        return max(len(a), len(b))
+
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [i if i <= max_distance else over] + [over] * len(b)
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]), over)
+        # the distance can only grow from the smallest value of the row
+        if min(current) > max_distance:
+            return None
+        previous = current
+
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def __hash(deletion):
+    return zlib.crc32(deletion.encode("utf-8"))
+
+
+def write_index(index_file, keys, source, max_distance, prefix_length):
+    """Compile the (title index, key) pairs into an index file, the deletions being taken from the first
+    prefix_length characters of the keys. The source dict identifies what the index has been built from and is
+    checked by is_current()"""
+    entries = set()
+    for title_index, key in keys:
+        for deletion in deletions(key[:prefix_length], max_distance):
+            entries.add(__hash(deletion) << 32 | title_index)
+    entries = array.array("Q", sorted(entries))
+
+    # the entries are aligned on 8 bytes
+    write_index_file(index_file, INDEX_MAGIC, INDEX_VERSION,
+                     {"source": source, "max_distance": max_distance, "prefix_length": prefix_length}, [entries], 8)
+
+    return len(entries)
+
+
+def open_index(index_file):
+    """Memory-map an index file. Returns a dict with the entries and the header, None if the file does not exist or
+    has not been written by this version"""
+    index = open_index_file(index_file, INDEX_MAGIC, INDEX_VERSION)
+    if index is not None:
+        index["entries"] = index["data"].cast("Q")
+
+    return index
+
+
+def is_current(index, source):
+    """Tells if the index has been built from this source"""
+    return indexfile.is_current(index, source)
+
+
+def close_index(index):
+    """Release the memory-mapped file of an index"""
+    close_index_file(index, ["entries"])
+
+
+def lookup(index, key, distance):
+    """Indexes of the titles whose key may be within distance edits of this key (distance being at most the one
+    of the index). Hash collisions give a few more titles, the caller checks the distance"""
+    entries = index["entries"]
+    titles = set()
+    for deletion in deletions(key[:index["prefix_length"]], distance):
+        hashed = __hash(deletion)
+        position = bisect.bisect_left(entries, hashed << 32)
+        while position < len(entries) and entries[position] >> 32 == hashed:
+            titles.add(entries[position] & 0xFFFFFFFF)
+            position += 1
+
+    return titles
@@ -0,0 +1,62 @@
+"""Container of the index files of podscripter (title index, approximate index) stored next to the SQLite DB : a
+magic string, the length of a JSON header, the header, then the data of the index, aligned. The header gives the
+version of the format, the byte order of the arrays and the source the index has been built from. Files are
+memory-mapped when parsing"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+
+def write_index_file(index_file, magic, version, header, chunks, alignment):
+    """Write an index file : its header dict, completed with the version and the byte order of the machine, then the
+    chunks of data (bytes or arrays), the first one starting on a multiple of alignment bytes"""
+    header = json.dumps(dict({"version": version, "byteorder": sys.byteorder}, **header)).encode("utf-8")
+    header += b" " * (-(len(magic) + 4 + len(header)) % alignment)
+
+    # writing in a temporary file of the process first, renamed over the index once complete : a parse running at the
+    # same time keeps reading the previous index, and processes rebuilding the index together do not mix their writes
+    tmp_file = "%s.%d.tmp" % (index_file, os.getpid())
+    with open(tmp_file, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_file, index_file)
+
+
+def open_index_file(index_file, magic, version):
+    """Memory-map an index file. Returns a dict with the header, the mmap and a memoryview of the data, None if the
+    file does not exist or has not been written by this version (arrays are stored in the native byte order of the
+    machine)"""
+    if not os.path.isfile(index_file) or os.path.getsize(index_file) < len(magic) + 4:
+        return None
+
+    with open(index_file, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(magic)] != magic:
+        mapped.close()
+        return None
+    header_length, = struct.unpack_from("<I", mapped, len(magic))
+    header_start = len(magic) + 4
+    header = json.loads(bytes(mapped[header_start:header_start + header_length]))
+    if header["version"] != version or header["byteorder"] != sys.byteorder:
+        mapped.close()
+        return None
+
+    return dict(header, mmap=mapped, data=memoryview(mapped)[header_start + header_length:])
+
+
+def close_index_file(index, views=()):
+    """Release the memoryviews of an index taken from its data, then the data and the memory-mapped file"""
+    for name in views:
+        index[name].release()
+    index["data"].release()
+    index["mmap"].close()
+
+
+def is_current(index, source):
+    """Tells if the index has been built from this source"""
+    return index is not None and index["source"] == source
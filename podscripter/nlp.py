@@ -0,0 +1,164 @@
+"""spaCy tagging of the transcribed files, shared by the preparse and parse actions"""
+import glob
+import os
+from os.path import isfile, join
+
+import spacy
+from spacy.tokens import DocBin
+
+from . import profiling
+
+SPACY_MODEL = "fr_core_news_md"
+# components not needed by the matching rules (POS, LEMMA, LOWER, ORTH) nor by the preparse (stop words)
+SPACY_EXCLUDED_COMPONENTS = ["parser", "ner"]
+# extension of the transcribed files, looked for in the folders given as a batch
+TEXT_EXTENSION = ".txt"
+# extension of the file next to a transcribed file holding its last tagged Doc
+DOC_CACHE_EXTENSION = ".spacy"
+# number of transcribed files tagged together by nlp.pipe in batch mode
+PIPE_BATCH_SIZE = 16
+
+# spaCy pipeline shared by preparse and parse, loaded on first use
+shared_nlp = None
+# last Doc tagged, reused as long as the same text is tagged again
+last_doc = None
+
+
+def load_nlp():
+    """Returns the spaCy pipeline, loaded once per process"""
+    global shared_nlp
+    if shared_nlp is None:
+        shared_nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
+
+    return shared_nlp
+
+
+def __pipeline_name(nlp):
+    """Name and version of the pipeline, stored with the cached Docs"""
+    return "%s-%s" % (nlp.meta["name"], nlp.meta["version"])
+
+
+def __cached_doc(text, cache_file, nlp):
+    """Returns the Doc of the text serialized in the cache file, None if there is none for this text and pipeline"""
+    if cache_file is not None and os.path.isfile(cache_file):
+        for doc in DocBin().from_disk(cache_file).get_docs(nlp.vocab):
+            if doc.text == text and doc.user_data.get("pipeline") == __pipeline_name(nlp):
+                return doc
+
+    return None
+
+
+def __cache_doc(doc, cache_file, nlp):
+    """Serialize a freshly tagged Doc as a DocBin in the cache file"""
+    doc.user_data["pipeline"] = __pipeline_name(nlp)
+    if cache_file is not None:
+        doc_bin = DocBin(store_user_data=True)
+        doc_bin.add(doc)
+        doc_bin.to_disk(cache_file)
+
+
+def tag(text, cache_file=None):
+    """Tags the text with the shared pipeline. The last Doc is kept in memory and, with a cache file, serialized as a
+    DocBin, so that tagging an unchanged text again, later in the process or in another run, costs nothing"""
+    global last_doc
+    nlp = load_nlp()
+
+    if last_doc is not None and last_doc.text == text:
+        return last_doc
+
+    with profiling.stage("tagging") as counts:
+        doc = __cached_doc(text, cache_file, nlp)
+        counts["cached"] = doc is not None
+        if doc is None:
+            doc = nlp(text)
+            __cache_doc(doc, cache_file, nlp)
+        counts["tokens"] = len(doc)
+    last_doc = doc
+
+    return doc
+
+
+def tag_batch(paths, batch_size=None, n_process=1):
+    """Tags several transcribed files with the shared pipeline. Files already tagged are taken from their cache, the
+    others are streamed through nlp.pipe, by batches of PIPE_BATCH_SIZE files by default. Yields (path, text, doc),
+    in no particular order"""
+    nlp = load_nlp()
+
+    pending = []
+    for path in paths:
+        text = read_transcript(path)
+        doc = __cached_doc(text, path + DOC_CACHE_EXTENSION, nlp)
+        if doc is not None:
+            yield path, text, doc
+        else:
+            pending.append((text, path))
+
+    for doc, path in nlp.pipe(pending, as_tuples=True, batch_size=batch_size or PIPE_BATCH_SIZE,
+                              n_process=n_process):
+        __cache_doc(doc, path + DOC_CACHE_EXTENSION, nlp)
+        yield path, doc.text, doc
+
+
+def transcribed_files(batch):
+    """Transcribed files of a batch, given as a folder (all its .txt files) or as a glob pattern"""
+    if os.path.isdir(batch):
+        batch = join(batch, "*" + TEXT_EXTENSION)
+
+    return sorted(path for path in glob.glob(batch) if isfile(path))
+
+
+def read_transcript(path):
+    """Reads a transcribed file as one text, the lines being joined with a space"""
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+
+    return ' '.join(lines)
+
+
+def __joined_length(lines):
+    """Length of the lines joined with a space, the trailing one included : offset of the line following them"""
+    return sum(len(line) + 1 for line in lines)
+
+
+def transcript_windows(path, window_words, overlap_words=0):
+    """Reads a transcribed file window by window, for the texts too long to be tagged at once. A window is made of
+    whole lines holding about window_words words not read yet, after the last lines of the previous window holding
+    at least overlap_words words. Only one window is in memory at a time.
+    Yields (offset, new_start, next_start, text) : offset of the window in the text read by read_transcript, offset
+    in the window of its first line not in the previous window, offset in the window of its first line carried over
+    to the next window (length of the text for the last one) and the text of the window, joined as read_transcript
+    does"""
+    lines = []
+    # number of lines of the window carried over from the previous one
+    carried = 0
+    new_words = 0
+    offset = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if new_words >= window_words:
+                # the window is full and followed by other lines : its last lines are kept for the next one
+                keep = len(lines)
+                overlap = 0
+                while keep > 0 and overlap < overlap_words:
+                    keep -= 1
+                    overlap += len(lines[keep].split())
+                yield offset, __joined_length(lines[:carried]), __joined_length(lines[:keep]), ' '.join(lines)
+                offset += __joined_length(lines[:keep])
+                lines = lines[keep:]
+                carried = len(lines)
+                new_words = 0
+            lines.append(line)
+            new_words += len(line.split())
+
+    if len(lines) > carried:
+        text = ' '.join(lines)
+        yield offset, __joined_length(lines[:carried]), len(text), text
+
+
+def write_transcript(path, transcribed_text):
+    """Overwrite a transcribed file with the text"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.truncate(0)
+        # undoing the join of the lines, reading the file again gives the same text
+        f.write(transcribed_text.replace('\n ', '\n'))
+    f.close()
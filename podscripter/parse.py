@@ -0,0 +1,543 @@
+"""parse action : films of the title index found in a transcribed file, first by a brute match of their titles,
+then by the matching rules run by spaCy on the tagged text"""
+import bisect
+import json
+import os
+import re
+import sqlite3
+from sqlite3 import Error
+
+from spacy.matcher import Matcher
+from spacy.tokens import Doc, Token
+
+from . import fuzzyindex, profiling, titleindex
+from .nlp import DOC_CACHE_EXTENSION, load_nlp, read_transcript, tag, tag_batch, transcribed_files, \
+    transcript_windows
+
+DB_FILE = "moviedb.db"
+TITLE_INDEX_FILE = DB_FILE + ".titles"
+# matching rules of the fine match, "<FILM>" standing for a brute-matched title in their patterns
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mr_rules.json")
+FILM_TOKEN = "<FILM>"
+# films matched in an episode are written next to its transcribed file, in batch mode
+FILMS_EXTENSION = ".films.json"
+# in windowed mode, number of words of the longest titles whose match may stand across two windows
+WINDOW_TITLE_WORDS = 12
+
+# setting up exception list, we have the word "film" to avoid the matcher to consider it as a film title since it
+# would make it miss matching rule MR1/2/3 (MR containg the word film)
+BRUTE_MATCH_EXCEPTIONS = ["film", "qui", "le nouveau", "a un"]
+
+# tokenizer of the full text index of the titles (movie_fts table of init.py), used for the words of the text
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# approximate index of the titles, for the titles mangled by the transcription
+APPROXIMATE_INDEX_FILE = DB_FILE + ".approx"
+# edits allowed by default between a title and the words of the text, 0 for exact matches only : the approximate
+# match is much slower than the brute match, it is asked for with --distance
+APPROXIMATE_DISTANCE = 0
+# the index is built for up to this number of edits, over the first characters of the titles
+APPROXIMATE_INDEX_DISTANCE = 2
+APPROXIMATE_PREFIX_LENGTH = 7
+# titles shorter or longer than this (in characters of their key) are only matched exactly
+APPROXIMATE_MIN_LENGTH = 6
+APPROXIMATE_MAX_LENGTH = 40
+# one edit is allowed per this number of characters of the title, short titles being too easily matched
+APPROXIMATE_CHARS_PER_EDIT = 5
+
+# matching rules and the matcher compiled from them, built on first use
+compiled_rules = None
+# title index opened by the process, kept open as long as the DB does not change
+shared_index = None
+# approximate index opened by the process, kept open as long as the title index does not change
+shared_approximate_index = None
+
+
+def create_connection(db_file):
+    """ create a database connection to the SQLite database
+        specified by db_file
+    :param db_file: database file
+    :return: Connection object or None
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file)
+        return conn
+    except Error as e:
+        print(e)
+
+    return conn
+
+
+def __database_extraction(transcribed_text=None):
+    """Extract the movie titles from SQLite DB and return a result set
+    We only get films with ratings to avoid being polluted by films with limited diffusion
+    We get the films ordered by length of title desc, for a better match with the transcribed file
+    We avoid getting film with less than 2 characters, that would make too much false positives, and the exceptions
+    With a transcribed text, only the titles whose words are all in the text are fetched, through the full text index
+    of the DB. A DB whose titles have not been normalized (see init.py --action migrate) is read as a whole"""
+    # Open connection
+    conn = create_connection(DB_FILE)
+    # Open a cursor to send SQL commands
+    cur = conn.cursor()
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(movie)")]
+    if "translated_terms" not in columns or cur.execute(
+            "select 1 from movie where rating > 0 and translated_length is null limit 1").fetchone():
+        print("Titles of %s not normalized, run init.py --action migrate" % DB_FILE)
+        sql = 'select translated, imdbid from movie where rating > 0 order by length(translated) desc'
+        rows = [(text_title, imdbid) for text_title, imdbid in cur.execute(sql)
+                if len(text_title) > 2 and text_title.casefold() not in BRUTE_MATCH_EXCEPTIONS]
+        conn.close()
+        return rows
+
+    conditions = 'rating > 0 and translated_length > 2 and translated_folded not in (%s)' \
+                 % ", ".join("?" * len(BRUTE_MATCH_EXCEPTIONS))
+    if transcribed_text is None:
+        sql = 'select translated, imdbid from movie where %s order by translated_length desc' % conditions
+    else:
+        # words of the text, split by the tokenizer of the full text index
+        cur.execute("create virtual table temp.transcript using fts5(text, tokenize='%s')" % FTS_TOKENIZER)
+        cur.execute("create virtual table temp.transcript_terms using fts5vocab(temp, transcript, row)")
+        cur.execute("insert into temp.transcript values (?)", (transcribed_text.casefold(),))
+        # titles with as many distinct words in the text as they have
+        sql = 'select translated, imdbid from movie join (select doc, count(distinct term) as terms ' \
+              'from movie_fts_terms where term in (select term from temp.transcript_terms) group by doc) as found ' \
+              'on found.doc = movie.id where %s and translated_terms = found.terms ' \
+              'order by translated_length desc' % conditions
+    cur.execute(sql, BRUTE_MATCH_EXCEPTIONS)
+    rows = cur.fetchall()
+    conn.close()
+
+    return rows
+
+
+def __load_rules(rules_file=RULES_FILE):
+    """Load the matching rules. Each rule has an id, an example and a pattern in which the "<FILM>" token stands for
+    the film title. The title is the part of the match we want to find so the pattern should not contain any optional
+    criterion before it (spacy can't tell which part of the pattern corresponds to the match)"""
+    with open(rules_file, encoding="utf-8") as f:
+        rules = json.load(f)
+    for rule in rules:
+        rule["position"] = rule["pattern"].index(FILM_TOKEN)
+
+    return rules
+
+
+def __rule_matcher():
+    """Returns the matching rules and one matcher holding all of them, each one under its own id. The "<FILM>" token
+    matches the tokens flagged as film candidates by the brute match, the matcher does not depend on the text and is
+    compiled once per process"""
+    global compiled_rules
+    if compiled_rules is None:
+        rules = __load_rules()
+        matcher = Matcher(load_nlp().vocab)
+        for rule in rules:
+            pattern = [{"_": {"film_candidate": True}} if token == FILM_TOKEN else token for token in rule["pattern"]]
+            matcher.add(rule["id"], [pattern])
+        compiled_rules = rules, matcher
+
+    return compiled_rules
+
+
+def __match_films(doc, matcher, rules, offset=0):
+    """ Fine match films with all the rules in a single pass of the matcher over the doc. Hits are routed to their
+    rule, which gives the position of the film in the match. Returns the hits as (rule id, start, end, film, match
+    text), start and end being the character offsets of the match in the text, the doc starting at offset"""
+    hits = []
+    with profiling.stage("match_films") as counts:
+        counts.update((rule["id"], 0) for rule in rules)
+        positions = {rule["id"]: rule["position"] for rule in rules}
+        for match_id, start, end in matcher(doc):
+            rule_id = doc.vocab.strings[match_id]
+            span = doc[start:end]
+            film = doc[start + positions[rule_id]]
+            # a title approximately matched is given as in the DB, the transcription having mangled it
+            hits.append((rule_id, offset + span.start_char, offset + span.end_char,
+                         film.text if film.text.casefold() == film._.film_title.casefold() else film._.film_title,
+                         span.text))
+            # the rules are run together, only their number of hits can be told apart
+            counts[rule_id] += 1
+
+    return hits
+
+
+def __report_matches(hits, rules):
+    """Print the matches of each rule, returns the list of films matched, rule by rule"""
+    match_list = []
+    for rule in rules:
+        match_text = []
+        for rule_id, _, _, film, text in hits:
+            if rule_id == rule["id"]:
+                match_list.append(film)
+                match_text.append(text)
+
+        print("Pattern : ", rule["pattern"])
+        if len(match_text) > 0:
+            print("Match   : ", match_text)
+        else:
+            print("No match")
+
+    return match_list
+
+
+def __casefold_with_offsets(text):
+    """Casefold a text character by character, returning the folded text and for each folded character the offset
+    of the original character it comes from (casefolding may expand a character, e.g. ß -> ss)"""
+    folded = []
+    origin = []
+    for offset, char in enumerate(text):
+        folded_char = char.casefold()
+        folded.append(folded_char)
+        origin.extend([offset] * len(folded_char))
+
+    return ''.join(folded), origin
+
+
+def __is_word_boundary(chars, offset):
+    """Same as regexp \\b : tells if there is a word boundary before the character at offset"""
+    before = chars[offset - 1][-1:] if offset > 0 else ''
+    after = chars[offset][:1] if offset < len(chars) else ''
+
+    return (before.isalnum() or before == '_') != (after.isalnum() or after == '_')
+
+
+def __title_index():
+    """Open the compiled title index stored next to the DB, (re)building it from the DB extraction when it does not
+    exist yet or when the DB file has changed since it was built. The index stays open for the next parses of the
+    process, a long-running process picking up a new DB at its next parse"""
+    global shared_index
+    db_stat = os.stat(DB_FILE)
+    source = {"db_size": db_stat.st_size, "db_mtime_ns": db_stat.st_mtime_ns, "exceptions": BRUTE_MATCH_EXCEPTIONS}
+    if titleindex.is_current(shared_index, source):
+        return shared_index
+
+    if shared_index is not None:
+        titleindex.close_index(shared_index)
+    index = titleindex.open_index(TITLE_INDEX_FILE)
+    if not titleindex.is_current(index, source):
+        if index is not None:
+            titleindex.close_index(index)
+        print("Building title index...")
+        with profiling.stage("db_extraction") as counts:
+            rows = __database_extraction()
+            counts["titles"] = len(rows)
+        with profiling.stage("index_build"):
+            titleindex.write_index(TITLE_INDEX_FILE, rows, source)
+        index = titleindex.open_index(TITLE_INDEX_FILE)
+    shared_index = index
+
+    return index
+
+
+def __targeted_index(transcribed_text, index_file):
+    """Title index of the titles whose words are all in the text only, fetched through the full text index of the DB
+    instead of the whole DB : a single parse does not wait for the title index to be built after a change of the DB.
+    The index is written in index_file, to be removed by the caller once closed"""
+    with profiling.stage("db_extraction") as counts:
+        rows = __database_extraction(transcribed_text)
+        counts["titles"] = len(rows)
+    with profiling.stage("index_build"):
+        titleindex.write_index(index_file, rows, {"transcript": True})
+
+    return titleindex.open_index(index_file)
+
+
+def load_resources():
+    """Loads the title index and the matcher ahead of the first parse, for a long-running process"""
+    __title_index()
+    __rule_matcher()
+
+
+def __brute_match(index, transcribed_text):
+    """Brute match the IMDB DB with the transcribed text, to detect film title only with a classic substring search
+    This leads to a lot a false positives but still filters the list for the fine-grained further
+    spacy matching process.
+    All the titles are searched at once with the automaton of the title index. Occurrences are kept in the order of
+    the DB extraction (longest titles first), only where they stand between word boundaries and do not overlap a
+    longer title already kept. Returns the candidates as (start, end, title, imdbid), start and end being character
+    offsets in the text"""
+    candidates = []
+
+    # using case folded transcribed text to match without case consideration, keeping track of the original offsets
+    transcribed_text_casefolded, origin = __casefold_with_offsets(transcribed_text)
+
+    # going through the text once to find every occurrence of every title
+    occurrences = {}
+    for pattern_index, end in titleindex.scan(index, transcribed_text_casefolded):
+        start = origin[end - titleindex.pattern_length(index, pattern_index)]
+        for title_index in titleindex.pattern_titles(index, pattern_index):
+            occurrences.setdefault(title_index, []).append((start, origin[end - 1] + 1))
+
+    # characters of the text already covered by a candidate
+    covered = bytearray(len(transcribed_text))
+    for title_index in sorted(occurrences):
+        text_title, imdbid = titleindex.title(index, title_index)
+        for start, end in occurrences[title_index]:
+            if __is_word_boundary(transcribed_text, start) \
+                    and __is_word_boundary(transcribed_text, end) \
+                    and 1 not in covered[start:end]:
+                # we add the brute-matched title to the list of possible real match
+                candidates.append((start, end, text_title, imdbid))
+                covered[start:end] = b"\1" * (end - start)
+
+    return sorted(candidates)
+
+
+def __approximate_index(index):
+    """Open the approximate index of the titles of the title index, (re)building it when it does not exist yet or
+    when the title index has changed since it was built"""
+    global shared_approximate_index
+    source = dict(index["source"], min_length=APPROXIMATE_MIN_LENGTH, max_length=APPROXIMATE_MAX_LENGTH)
+    if fuzzyindex.is_current(shared_approximate_index, source):
+        return shared_approximate_index
+
+    if shared_approximate_index is not None:
+        fuzzyindex.close_index(shared_approximate_index)
+    approximate_index = fuzzyindex.open_index(APPROXIMATE_INDEX_FILE)
+    if not fuzzyindex.is_current(approximate_index, source) \
+            or approximate_index["max_distance"] != APPROXIMATE_INDEX_DISTANCE \
+            or approximate_index["prefix_length"] != APPROXIMATE_PREFIX_LENGTH:
+        if approximate_index is not None:
+            fuzzyindex.close_index(approximate_index)
+        print("Building approximate title index...")
+        with profiling.stage("approximate_index_build") as counts:
+            keys = []
+            for title_index in range(titleindex.title_count(index)):
+                key = fuzzyindex.normalize(titleindex.title(index, title_index)[0])
+                if APPROXIMATE_MIN_LENGTH <= len(key) <= APPROXIMATE_MAX_LENGTH:
+                    keys.append((title_index, key))
+            counts["titles"] = len(keys)
+            counts["entries"] = fuzzyindex.write_index(APPROXIMATE_INDEX_FILE, keys, source,
+                                                       APPROXIMATE_INDEX_DISTANCE, APPROXIMATE_PREFIX_LENGTH)
+        approximate_index = fuzzyindex.open_index(APPROXIMATE_INDEX_FILE)
+    shared_approximate_index = approximate_index
+
+    return approximate_index
+
+
+def __approximate_match(index, transcribed_text, candidates, distance):
+    """Approximate match of the titles with the words of the text, to catch the titles mangled by the transcription.
+    Every run of words of a line is reduced to a key and looked up in the approximate index, the titles found being
+    kept within distance edits (one edit per APPROXIMATE_CHARS_PER_EDIT characters of the title at most). Closest and
+    longest titles are kept first, without overlapping each other. A title approximately matched replaces the
+    shorter candidates of the brute match it contains ("ventura" in "la ventura"), not the others.
+    Returns the candidates of the brute match kept and the new ones as (start, end, title, imdbid), sorted"""
+    approximate_index = __approximate_index(index)
+    distance = min(distance, approximate_index["max_distance"])
+    excluded_words = {fuzzyindex.normalize(exception) for exception in BRUTE_MATCH_EXCEPTIONS if " " not in exception}
+    words = [(word.start(), word.end(), fuzzyindex.normalize(word.group()))
+             for word in re.finditer(r"\w+", transcribed_text)]
+
+    # the runs of words sharing a prefix share their lookup, whose titles are grouped by length of their key
+    lookups = {}
+    title_keys = {}
+    found = []
+    for first, (start, _, _) in enumerate(words):
+        key = ""
+        for following in range(first, len(words)):
+            word_start, end, word_key = words[following]
+            # a run stops at a line break, as a title of the brute match does
+            if word_key in excluded_words \
+                    or following > first and "\n" in transcribed_text[words[following - 1][1]:word_start]:
+                break
+            key += word_key
+            if len(key) > APPROXIMATE_MAX_LENGTH + distance:
+                break
+            if len(key) < APPROXIMATE_MIN_LENGTH - distance:
+                continue
+            prefix = key[:approximate_index["prefix_length"]]
+            if prefix not in lookups:
+                lookups[prefix] = {}
+                for title_index in fuzzyindex.lookup(approximate_index, prefix, distance):
+                    if title_index not in title_keys:
+                        title_keys[title_index] = fuzzyindex.normalize(titleindex.title(index, title_index)[0])
+                    title_key = title_keys[title_index]
+                    lookups[prefix].setdefault(len(title_key), []).append((title_index, title_key))
+            for length in range(len(key) - distance, len(key) + distance + 1):
+                for title_index, title_key in lookups[prefix].get(length, []):
+                    edits = fuzzyindex.edit_distance(key, title_key,
+                                                     min(distance, length // APPROXIMATE_CHARS_PER_EDIT))
+                    if edits is not None:
+                        found.append((edits, -length, start, end, title_index))
+
+    candidates = sorted(candidates)
+    starts = [start for start, _, _, _ in candidates]
+    replaced = set()
+    # characters of the text covered by a title approximately matched
+    covered = bytearray(len(transcribed_text))
+    approximate_candidates = []
+    for _, _, start, end, title_index in sorted(found):
+        if 1 in covered[start:end]:
+            continue
+        # candidates of the brute match overlapping the title, the brute match candidates not overlapping each other
+        overlapped = [position for position in range(max(bisect.bisect_right(starts, start) - 1, 0),
+                                                     bisect.bisect_left(starts, end))
+                      if candidates[position][1] > start and candidates[position][0] < end]
+        if any(candidates[position][0] < start or candidates[position][1] > end
+               or candidates[position][1] - candidates[position][0] >= end - start for position in overlapped):
+            continue
+        text_title, imdbid = titleindex.title(index, title_index)
+        approximate_candidates.append((start, end, text_title, imdbid))
+        covered[start:end] = b"\1" * (end - start)
+        replaced.update(overlapped)
+
+    return sorted([candidate for position, candidate in enumerate(candidates) if position not in replaced]
+                  + approximate_candidates)
+
+
+def __find_candidates(index, transcribed_text, distance=None):
+    """Brute match of the titles, then approximate match within distance edits (APPROXIMATE_DISTANCE by default)
+    where the text is not matched yet. Returns the candidates as (start, end, title, imdbid), sorted by offset"""
+    if distance is None:
+        distance = APPROXIMATE_DISTANCE
+    with profiling.stage("brute_match") as counts:
+        candidates = __brute_match(index, transcribed_text)
+        counts["candidates"] = len(candidates)
+    if distance:
+        with profiling.stage("approximate_match") as counts:
+            approximate_candidates = __approximate_match(index, transcribed_text, candidates, distance)
+            counts["candidates"] = len(set(approximate_candidates) - set(candidates))
+        candidates = approximate_candidates
+
+    return candidates
+
+
+def __mark_candidates(doc, candidates):
+    """Flag the candidate titles on a copy of the doc. The tokens of a title are merged into one token (the spacy
+    matcher would otherwise see several tokens and miss a match) with the film_candidate and film_title extensions
+    set. Candidates not aligned on tokens are dropped"""
+    if not Token.has_extension("film_candidate"):
+        Token.set_extension("film_candidate", default=False)
+        Token.set_extension("film_title", default=None)
+
+    # the doc given may be the cached one, it is kept untouched
+    doc = Doc(doc.vocab).from_bytes(doc.to_bytes())
+    with doc.retokenize() as retokenizer:
+        for start, end, text_title, imdbid in candidates:
+            span = doc.char_span(start, end)
+            if span is not None:
+                retokenizer.merge(span, attrs={"_": {"film_candidate": True, "film_title": text_title}})
+
+    return doc
+
+
+def __fine_match(candidates, tagged_doc, tagging=False):
+    """Fine-matching using spacy matcher and the matching rules of RULES_FILE, e.g.
+    MR1 :   {"LOWER": "film"}, "<FILM>", {"POS": "PROPN"}
+        --> film vous ne désirez que moi Claire Simon
+    MR2 :   {"POS": "DET"}, {"LOWER": "film"}, "<FILM>", {"TEXT": "de"}
+        --> Le film les jeunes amants de carine tardieu
+    All the rules are run in a single pass of the matcher, adding a rule to the file does not add a scan of the text.
+    The transcribed text is tagged as is, the candidates of the brute match being flagged on the doc. With tagging,
+    the tokens are printed with their tags
+    """
+    rules, matcher = __rule_matcher()
+    doc = __mark_candidates(tagged_doc, candidates)
+
+    if tagging:
+        for token in doc:
+            print(token.text, token.lemma_, token.pos_, token.tag_,
+                  token.shape_, token.is_alpha, token.is_stop)
+
+    match_list = __report_matches(__match_films(doc, matcher, rules), rules)
+
+    return list(dict.fromkeys(match_list))
+
+
+def parse(transcribed_file, tagging=False, distance=None, targeted=False):
+    """Parse the input file to match film contained in the text.
+    1. Load the file
+    2. Open the title index compiled from the IMDB DB, or with targeted, build one from the titles of the DB whose
+    words are all in the text (exact matches only)
+    3. Brute match with the title index, then approximate match within distance edits (0 by default, exact matches
+    only)
+    4. Fine match with SPACY matcher"""
+    with profiling.stage("parse"):
+        # loading data from input text file
+        transcribed_text = read_transcript(transcribed_file)
+
+        # loading the title index, built from the DB when needed
+        with profiling.stage("title_index"):
+            if targeted:
+                index_file = "%s.%d" % (TITLE_INDEX_FILE, os.getpid())
+                index = __targeted_index(transcribed_text, index_file)
+            else:
+                index = __title_index()
+
+        # proceed with brute match, the approximate match needing the titles of the whole DB
+        try:
+            candidates = __find_candidates(index, transcribed_text, 0 if targeted else distance)
+        finally:
+            if targeted:
+                titleindex.close_index(index)
+                os.remove(index_file)
+
+        # proceed with spacy fine match
+        doc = tag(transcribed_text, transcribed_file + DOC_CACHE_EXTENSION)
+        with profiling.stage("fine_match") as counts:
+            match_list = __fine_match(candidates, doc, tagging)
+            counts["matches"] = len(match_list)
+
+    return match_list
+
+
+def parse_batch(batch, batch_size=None, n_process=1, tagging=False, distance=None):
+    """Parse all the transcribed files of a batch (folder or glob pattern). The title index and the matcher are
+    loaded once for the whole batch and the files are tagged together with nlp.pipe. The films matched in each
+    episode are written as a JSON list next to its transcribed file. Returns the number of files parsed"""
+    with profiling.stage("title_index"):
+        index = __title_index()
+    __rule_matcher()
+
+    count = 0
+    for path, transcribed_text, doc in tag_batch(transcribed_files(batch), batch_size, n_process):
+        print("Parsing", path)
+        with profiling.stage("parse") as counts:
+            candidates = __find_candidates(index, transcribed_text, distance)
+            match_list = __fine_match(candidates, doc, tagging)
+            counts.update(file=path, candidates=len(candidates), matches=len(match_list))
+        with open(os.path.splitext(path)[0] + FILMS_EXTENSION, "w", encoding="utf-8") as f:
+            json.dump(match_list, f, ensure_ascii=False)
+        count += 1
+
+    return count
+
+
+def parse_windowed(transcribed_file, window_words, tagging=False, distance=None):
+    """Parse a long transcribed file window by window (see nlp.transcript_windows), so that the memory used does not
+    grow with the length of the episode. Each window is brute matched and tagged on its own, no Doc being cached.
+    Windows overlap by enough words for the longest rule around a long title : a match is kept from the window
+    where it starts before the overlap with the next one, where its right context is known, and the matches are
+    de-duplicated by their offsets in the whole text. Returns the same list as parse"""
+    with profiling.stage("parse") as counts:
+        with profiling.stage("title_index"):
+            index = __title_index()
+        rules, matcher = __rule_matcher()
+        nlp = load_nlp()
+
+        # words are fewer than tokens (elisions, punctuation), the overlap is taken twice as long
+        overlap_words = 2 * (max(len(rule["pattern"]) for rule in rules) + WINDOW_TITLE_WORDS)
+        hits = {}
+        counts.update(windows=0, candidates=0)
+        for offset, new_start, next_start, text in transcript_windows(transcribed_file, window_words, overlap_words):
+            candidates = __find_candidates(index, text, distance)
+            with profiling.stage("tagging"):
+                doc = __mark_candidates(nlp(text), candidates)
+
+            if tagging:
+                # the tokens carried over from the previous window are printed once
+                for token in doc:
+                    if token.idx >= new_start:
+                        print(token.text, token.lemma_, token.pos_, token.tag_,
+                              token.shape_, token.is_alpha, token.is_stop)
+
+            for hit in __match_films(doc, matcher, rules, offset):
+                if hit[1] < offset + next_start:
+                    hits.setdefault(hit[:3], hit)
+            counts["windows"] += 1
+            counts["candidates"] += len(candidates)
+
+        match_list = list(dict.fromkeys(__report_matches(sorted(hits.values(), key=lambda hit: hit[1]), rules)))
+        counts["matches"] = len(match_list)
+
+    return match_list
@@ -0,0 +1,161 @@
+"""ingest action : the new episodes of a feed downloaded, converted, transcribed and parsed by an asyncio pipeline
+Each stage has its own workers and is fed by a bounded queue : while an episode is transcribed, the next ones are
+downloaded and converted and the previous one is parsed. A stage whose queue is full holds the stages before it, so
+that no more than a few episodes wait on disk between two stages"""
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import download, profiling
+
+STAGES = ["download", "convert", "transcribe", "parse"]
+# workers of each stage : threads for the downloads, processes for the others, each one keeping its models loaded
+STAGE_WORKERS = {"download": 4, "convert": 2, "transcribe": 2, "parse": 1}
+# episodes waiting between two stages
+PIPELINE_QUEUE_SIZE = 2
+# GUIDs of the episodes parsed by the ingest action, an episode failing or interrupted being ingested again next time
+INGESTED_EPISODES_FILE = download.PODCAST_DIR + "ingested.json"
+
+
+def __convert_episode(episode_file):
+    """Convert stage, run in a worker process : returns the folder of the chunks"""
+    from .convert import conversion
+    return conversion(episode_file)
+
+
+def __transcribe_episode(chunk_folder):
+    """Transcribe stage, run in a worker process : returns the transcribed file"""
+    from .transcribe import transcription
+    return transcription(chunk_folder)
+
+
+def __parse_episode(transcribed_file):
+    """Preparse and parse stage, run in a worker process. The films matched are written next to the transcribed
+    file, as in batch mode, and returned"""
+    from .parse import FILMS_EXTENSION, parse
+    from .preparse import preparse
+    preparse(transcribed_file)
+    match_list = parse(transcribed_file)
+    with open(os.path.splitext(transcribed_file)[0] + FILMS_EXTENSION, "w", encoding="utf-8") as f:
+        json.dump(match_list, f, ensure_ascii=False)
+
+    return match_list
+
+
+async def __run_stage(name, run, executor, workers, inbox, outbox, next_workers, report, done=None):
+    """Workers of a stage : each one takes an episode from the inbox, runs the stage on it in the executor and puts
+    the result in the outbox, waiting for room in it. An episode failing is reported and dropped. None in the inbox
+    stops a worker, the stage then stops the workers of the next one"""
+    loop = asyncio.get_running_loop()
+
+    async def worker():
+        while True:
+            episode = await inbox.get()
+            if episode is None:
+                return
+            guid, value = episode
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(executor, run, value)
+            except (Exception, SystemExit) as e:
+                print("%s : %s failed, %s" % (guid, name, e))
+                report[name]["failed"] += 1
+                continue
+            finally:
+                report[name]["busy"] += time.perf_counter() - start
+            report[name]["episodes"] += 1
+            if done is not None:
+                done(guid, result)
+            if outbox is not None:
+                await outbox.put((guid, result))
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        for _ in range(next_workers):
+            await outbox.put(None)
+
+
+async def __pipeline(episodes, ingested, workers):
+    """Runs the episodes through the stages, returns the films matched by episode GUID and the time each stage
+    has been busy. An episode is recorded as ingested once parsed, an episode already on disk is not downloaded
+    again"""
+    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in STAGES]
+    report = {name: {"episodes": 0, "failed": 0, "busy": 0.0} for name in STAGES}
+    films = {}
+    seen = download.load_seen_episodes()
+
+    def fetch(session, url, folder_file):
+        # a whole episode downloaded by a previous run, whose later stages failed or were interrupted
+        if os.path.isfile(folder_file):
+            return folder_file
+        return download.download_episode(session, url, folder_file)
+
+    def downloaded(guid, _):
+        # the download action does not fetch the episode again either
+        seen.add(guid)
+        download.save_seen_episodes(seen)
+
+    def parsed(guid, match_list):
+        films[guid] = match_list
+        print(guid, match_list)
+        ingested.add(guid)
+        download.save_seen_episodes(ingested, INGESTED_EPISODES_FILE)
+
+    async def feed():
+        for guid, (url, folder_file) in episodes.items():
+            await queues[0].put((guid, (url, folder_file)))
+        for _ in range(workers["download"]):
+            await queues[0].put(None)
+
+    # processes are spawned, not forked from a process running threads
+    context = multiprocessing.get_context("spawn")
+    with download.download_session(workers["download"]) as session, \
+            ThreadPoolExecutor(workers["download"]) as download_executor, \
+            ProcessPoolExecutor(workers["convert"], mp_context=context) as convert_executor, \
+            ProcessPoolExecutor(workers["transcribe"], mp_context=context) as transcribe_executor, \
+            ProcessPoolExecutor(workers["parse"], mp_context=context) as parse_executor:
+        await asyncio.gather(
+            feed(),
+            __run_stage("download", lambda episode: fetch(session, *episode), download_executor,
+                        workers["download"], queues[0], queues[1], workers["convert"], report, downloaded),
+            __run_stage("convert", __convert_episode, convert_executor,
+                        workers["convert"], queues[1], queues[2], workers["transcribe"], report),
+            __run_stage("transcribe", __transcribe_episode, transcribe_executor,
+                        workers["transcribe"], queues[2], queues[3], workers["parse"], report),
+            __run_stage("parse", __parse_episode, parse_executor,
+                        workers["parse"], queues[3], None, 0, report, parsed))
+
+    return films, report
+
+
+def ingest(xml_feed_url, workers=None):
+    """Download the new episodes of a feed and find the films they talk about, the stages of different episodes
+    running at the same time. The episodes not parsed yet by a previous ingest, failed or interrupted, are run
+    again from their file when it has been downloaded. workers gives the number of workers of some stages,
+    STAGE_WORKERS being used for the others. Returns the number of episodes parsed"""
+    if not os.path.exists("model"):
+        print(
+            "Please download the model from https://alphacephei.com/vosk/models and unpack as 'model' in the current folder.")
+        exit(1)
+    workers = dict(STAGE_WORKERS, **(workers or {}))
+
+    start = time.perf_counter()
+    ingested = download.load_seen_episodes(INGESTED_EPISODES_FILE)
+    episodes = {guid: episode for guid, episode in download.feed_episodes(xml_feed_url).items()
+                if guid not in ingested}
+    print("%d episode(s) to ingest" % len(episodes))
+
+    films, report = asyncio.run(__pipeline(episodes, ingested, workers))
+
+    wall = time.perf_counter() - start
+    for name in STAGES:
+        print("%-10s %3d episode(s) %3d failed, busy %8.1fs" % (name, report[name]["episodes"],
+                                                                 report[name]["failed"], report[name]["busy"]))
+        profiling.record("ingest/" + name, report[name]["busy"], report[name])
+    print("Ingested in %.1fs" % wall)
+    profiling.record("ingest", wall, {"episodes": len(episodes), "parsed": len(films)})
+
+    return len(films)
@@ -0,0 +1,144 @@
+"""preparse action : names and surnames capitalized in a transcribed file before it is parsed"""
+import importlib.metadata
+import json
+import os
+
+from . import profiling
+from .nlp import DOC_CACHE_EXTENSION, load_nlp, read_transcript, tag, tag_batch, transcribed_files, \
+    transcript_windows, write_transcript
+
+# top names of name-dataset used by the preparse : (n, use_first_names, country_alpha2)
+NAMES_LEXICON_QUERIES = [(250, True, "FR"), (250, True, "US"), (250, True, "GB"),
+                         (5000, False, "FR"), (5000, False, "US"), (5000, False, "GB")]
+# lexicon built from these queries, one name per line after a header line identifying the dataset and the queries
+NAMES_LEXICON_FILE = "names.lexicon"
+
+# names of the lexicon, loaded on first use
+names_lexicon = None
+
+
+def __names_lexicon():
+    """Returns the set of common names and surnames used by the preparse.
+    Building it from name-dataset takes seconds, it is then kept in NAMES_LEXICON_FILE and only rebuilt when the
+    version of name-dataset or the queries change"""
+    global names_lexicon
+    if names_lexicon is not None:
+        return names_lexicon
+
+    header = json.dumps({"names_dataset": importlib.metadata.version("names-dataset"),
+                         "queries": NAMES_LEXICON_QUERIES})
+    if os.path.isfile(NAMES_LEXICON_FILE):
+        with open(NAMES_LEXICON_FILE, encoding="utf-8") as f:
+            if f.readline().rstrip("\n") == header:
+                names_lexicon = frozenset(f.read().splitlines())
+                return names_lexicon
+
+    print("Building names lexicon...")
+    # name-dataset takes seconds to load, it is only imported when the lexicon has to be built
+    from names_dataset import NameDataset
+
+    nd = NameDataset()
+    common_names = set()
+    for n, use_first_names, country in NAMES_LEXICON_QUERIES:
+        common_names_dict = nd.get_top_names(n=n, use_first_names=use_first_names, country_alpha2=country)
+        if use_first_names:
+            common_names.update(common_names_dict[country]["M"])
+            common_names.update(common_names_dict[country]["F"])
+        else:
+            common_names.update(common_names_dict[country])
+
+    # temporary file of the process, processes building the lexicon together do not mix their writes
+    tmp_file = "%s.%d.tmp" % (NAMES_LEXICON_FILE, os.getpid())
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(header + "\n")
+        f.write("\n".join(sorted(common_names)))
+    os.replace(tmp_file, NAMES_LEXICON_FILE)
+    names_lexicon = frozenset(common_names)
+
+    return names_lexicon
+
+
+def load_resources():
+    """Loads the spaCy pipeline and the names lexicon ahead of the first preparse, for a long-running process"""
+    load_nlp()
+    __names_lexicon()
+
+
+def __capitalize_names(doc):
+    """Capitalize the names and surnames found in the tagged text, returns the new text"""
+    # Create list of word tokens after removing stopwords
+    token_list = set()
+    with profiling.stage("names_lexicon") as counts:
+        common_names = __names_lexicon()
+        counts["names"] = len(common_names)
+
+    with profiling.stage("capitalize") as counts:
+        for token in doc:
+            if not token.is_stop:  # and token.pos_ == "NOUN":
+                if token.text.capitalize() in common_names:
+                    token_list.add(token.text)
+        counts["names"] = len(token_list)
+
+    # every occurrence of a name is capitalized, the text being rebuilt from the tokens in a single pass
+    return "".join(token.text.capitalize() + token.whitespace_ if token.text in token_list
+                   else token.text_with_ws for token in doc)
+
+
+def preparse(transcribed_file):
+    """ Prepare the transcribed file to be analyzed by SPACY matcher and overwrite it.
+    The only action made for now is to capitalize names and surnames based on philipperemy name-dataset
+    This action is here to provide SPACY matcher a file where names and surnames can be identified and not
+    mingled with adjectives.
+    Uses the top 500 first-names in FR, GB and US. The other nationalities would not be correctly recognized
+    and transcribed by VOSK anyway"""
+    print('Preparsing...')
+
+    with profiling.stage("preparse"):
+        transcribed_text = read_transcript(transcribed_file)
+
+        # the Doc is cached next to the file : when no name has to be capitalized, parse finds it already tagged
+        doc = tag(transcribed_text, transcribed_file + DOC_CACHE_EXTENSION)
+        transcribed_text = __capitalize_names(doc)
+
+        write_transcript(transcribed_file, transcribed_text)
+
+    print("End")
+
+
+def preparse_batch(batch, batch_size=None, n_process=1):
+    """Preparse all the transcribed files of a batch (folder or glob pattern), tagging them together with nlp.pipe.
+    Returns the number of files preparsed"""
+    print('Preparsing...')
+    __names_lexicon()
+
+    count = 0
+    for path, _, doc in tag_batch(transcribed_files(batch), batch_size, n_process):
+        with profiling.stage("preparse") as counts:
+            write_transcript(path, __capitalize_names(doc))
+            counts["file"] = path
+        count += 1
+
+    print("End")
+
+    return count
+
+
+def preparse_windowed(transcribed_file, window_words):
+    """Preparse a long transcribed file window by window (see nlp.transcript_windows), so that the memory used does
+    not grow with the length of the episode. Whether a token is a name only depends on its text, the windows do not
+    need to overlap. The preparsed text is written as the windows go, then replaces the transcribed file"""
+    print('Preparsing...')
+    nlp = load_nlp()
+
+    with profiling.stage("preparse") as counts:
+        counts["windows"] = 0
+        with open(transcribed_file + ".preparse", "w", encoding="utf-8") as f:
+            for _, _, _, text in transcript_windows(transcribed_file, window_words):
+                with profiling.stage("tagging"):
+                    doc = nlp(text)
+                # undoing the join of the lines, as write_transcript does
+                f.write(__capitalize_names(doc).replace('\n ', '\n'))
+                counts["windows"] += 1
+        os.replace(transcribed_file + ".preparse", transcribed_file)
+
+    print("End")
@@ -0,0 +1,60 @@
+"""Measure of the stages of an action (--profile), written as a JSON report at the end of the run"""
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# stages measured when profiling (--profile), None when not profiling
+profile_stages = None
+# names of the stages being measured, a stage being named after the stages it runs in
+profile_path = []
+
+
+def enable():
+    """Starts recording the stages"""
+    global profile_stages
+    profile_stages = []
+
+
+@contextmanager
+def stage(name):
+    """Measures a stage when profiling : wall time, CPU time of the process and of its children (ffmpeg, workers),
+    peak RSS of the process so far. The stage may add item counts to the dict it gets"""
+    counts = {}
+    if profile_stages is None:
+        yield counts
+        return
+
+    profile_path.append(name)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    start_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        yield counts
+    finally:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        profile_stages.append({
+            "stage": "/".join(profile_path),
+            "wall": round(time.perf_counter() - start_wall, 6),
+            "cpu": round(time.process_time() - start_cpu, 6),
+            "children_cpu": round(children.ru_utime + children.ru_stime
+                                  - start_children.ru_utime - start_children.ru_stime, 6),
+            # kilobytes on Linux
+            "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "counts": counts})
+        profile_path.pop()
+
+
+def record(name, wall, counts):
+    """Records a stage measured by the caller, for the stages running at the same time as others (pipeline), which
+    cannot be nested"""
+    if profile_stages is not None:
+        profile_stages.append({"stage": name, "wall": round(wall, 6),
+                               "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "counts": counts})
+
+
+def write_report(profile_file):
+    """Writes the stages measured in a JSON report"""
+    with open(profile_file, "w") as f:
+        json.dump({"argv": sys.argv[1:], "stages": profile_stages}, f, indent=2)
+    print("Profile written in", profile_file)
@@ -0,0 +1,169 @@
+"""service action : a local HTTP service keeping the VOSK model, the spaCy pipeline, the names lexicon, the matcher
+and the title index in memory, so that an episode only costs its processing. Episodes are submitted as jobs, run
+one at a time in the order of submission:
+    POST /jobs      {"audio": path} or {"transcript": path} or {"text": transcript}, returns the job id
+    GET /jobs/<id>  state of the job, with the films matched once done
+    GET /stats      queue depth, jobs run and their latency
+The title index is rebuilt between two jobs when moviedb.db has changed"""
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import parse, preparse
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8750
+# folder of the transcripts submitted as text
+JOBS_FOLDER = "jobs"
+# number of finished jobs kept for the status requests and the latency statistics
+JOBS_HISTORY = 1000
+
+# jobs waiting to be run
+job_queue = queue.Queue()
+# jobs by id, the finished ones being forgotten beyond JOBS_HISTORY
+jobs = {}
+finished_jobs = deque()
+jobs_lock = threading.Lock()
+job_ids = itertools.count(1)
+
+
+def submit(request):
+    """Checks a submission and queues its job. Returns the job, or an error message"""
+    if "text" in request:
+        os.makedirs(JOBS_FOLDER, exist_ok=True)
+        job = {"id": next(job_ids), "kind": "transcript"}
+        job["file"] = os.path.join(JOBS_FOLDER, "%d.txt" % job["id"])
+        with open(job["file"], "w", encoding="utf-8") as f:
+            f.write(request["text"])
+    elif "audio" in request or "transcript" in request:
+        kind = "audio" if "audio" in request else "transcript"
+        if not os.path.isfile(request[kind]):
+            return "%s not found" % request[kind]
+        if kind == "audio" and not os.path.exists("model"):
+            return "no VOSK model in the service folder"
+        job = {"id": next(job_ids), "kind": kind, "file": request[kind]}
+    else:
+        return "audio, transcript or text expected"
+
+    job.update(state="queued", submitted=time.time(), films=None, error=None)
+    with jobs_lock:
+        jobs[job["id"]] = job
+    job_queue.put(job)
+
+    return job
+
+
+def __run_job(job):
+    """Transcribes, preparses and parses the episode of a job, returns the films matched"""
+    transcribed_file = job["file"]
+    if job["kind"] == "audio":
+        from .transcribe import stream_transcription
+        transcribed_file = stream_transcription(job["file"])
+    preparse.preparse(transcribed_file)
+
+    return parse.parse(transcribed_file)
+
+
+def __worker():
+    """Runs the queued jobs one at a time, the resources being shared by all of them"""
+    while True:
+        job = job_queue.get()
+        job.update(state="running", started=time.time())
+        try:
+            job["films"] = __run_job(job)
+            job["state"] = "done"
+        except (Exception, SystemExit) as e:
+            job.update(state="failed", error=str(e) or type(e).__name__)
+        job["ended"] = time.time()
+        job.update(wait=round(job["started"] - job["submitted"], 3),
+                   processing=round(job["ended"] - job["started"], 3))
+        print("Job %d %s in %.3fs" % (job["id"], job["state"], job["processing"]))
+
+        with jobs_lock:
+            finished_jobs.append(job)
+            if len(finished_jobs) > JOBS_HISTORY:
+                del jobs[finished_jobs.popleft()["id"]]
+        job_queue.task_done()
+
+
+def __latency(values):
+    """Mean, median, 95th percentile and maximum of the latencies, in seconds"""
+    if not values:
+        return None
+    values = sorted(values)
+
+    return {"mean": round(sum(values) / len(values), 3), "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, len(values) * 95 // 100)], "max": values[-1]}
+
+
+def stats():
+    """Queue depth, number of jobs by state and latency of the finished jobs (time waiting in the queue, processing
+    time and both)"""
+    with jobs_lock:
+        done = list(finished_jobs)
+        states = [job["state"] for job in jobs.values()]
+
+    return {"queue_depth": job_queue.qsize(), "jobs": {state: states.count(state) for state in set(states)},
+            "latency": {"wait": __latency([job["wait"] for job in done]),
+                        "processing": __latency([job["processing"] for job in done]),
+                        "total": __latency([round(job["wait"] + job["processing"], 3) for job in done])}}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Requests of the service API"""
+
+    def __reply(self, status, body):
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            return self.__reply(200, stats())
+        if self.path.startswith("/jobs/") and self.path[len("/jobs/"):].isdigit():
+            with jobs_lock:
+                job = jobs.get(int(self.path[len("/jobs/"):]))
+            if job is not None:
+                return self.__reply(200, job)
+        self.__reply(404, {"error": "unknown path or job"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self.__reply(404, {"error": "unknown path"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            return self.__reply(400, {"error": "JSON body expected"})
+        job = submit(request) if isinstance(request, dict) else "JSON object expected"
+        if isinstance(job, str):
+            return self.__reply(400, {"error": job})
+        self.__reply(202, {"id": job["id"], "queue_depth": job_queue.qsize()})
+
+
+def serve(port=SERVICE_PORT):
+    """Loads the resources then serves the API on localhost until interrupted"""
+    print("Loading resources...")
+    start = time.time()
+    preparse.load_resources()
+    parse.load_resources()
+    if os.path.exists("model"):
+        from .transcribe import load_model
+        load_model()
+    print("Resources loaded in %.1fs" % (time.time() - start))
+
+    threading.Thread(target=__worker, daemon=True).start()
+    server = ThreadingHTTPServer((SERVICE_HOST, port), ServiceHandler)
+    print("Serving on http://%s:%d" % (SERVICE_HOST, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
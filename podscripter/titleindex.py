@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Compiled title index used by the brute match of podscripter.
+The Aho-Corasick automaton built over the casefolded movie titles is flattened into arrays of unsigned integers and
+stored in a single file next to the SQLite DB. The file is memory-mapped when parsing, so only the pages touched by
+the scan of the transcribed text are read from disk, whatever the size of the movie table."""
+import array
+import bisect
+from collections import deque
+
+from . import indexfile
+from .indexfile import close_index_file, open_index_file, write_index_file
+
+INDEX_MAGIC = b"PODTIDX1"
+INDEX_VERSION = 1
+# sections of unsigned 32-bit integers stored in the index, in file order
+INDEX_SECTIONS = ["edge_start", "edge_chars", "edge_targets", "fail", "out_link", "out_start", "out_patterns",
+                  "pattern_length", "pattern_start", "pattern_titles", "title_start", "imdbid_start"]
+# sections of UTF-8 bytes
+INDEX_BLOBS = ["titles", "imdbids"]
+
+
+def build_automaton(patterns):
+    """Build an Aho-Corasick automaton over the patterns, so that all of them can be searched in one pass
+    over the text. Returns the goto table (a dict of transitions per node), the failure links, the pattern indexes
+    ending on each node and the output links (nearest node on the failure path ending a pattern)"""
+    goto = [{}]
+    fail = [0]
+    output = [[]]
+
+    # building the trie of patterns
+    for index, pattern in enumerate(patterns):
+        node = 0
+        for char in pattern:
+            next_node = goto[node].get(char)
+            if next_node is None:
+                next_node = len(goto)
+                goto[node][char] = next_node
+                goto.append({})
+                fail.append(0)
+                output.append([])
+            node = next_node
+        output[node].append(index)
+
+    # computing failure and output links breadth first, a node always being processed after its failure node
+    out_link = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for char, next_node in goto[node].items():
+            queue.append(next_node)
+            state = fail[node]
+            while state and char not in goto[state]:
+                state = fail[state]
+            fail[next_node] = goto[state].get(char, 0)
+            out_link[next_node] = fail[next_node] if output[fail[next_node]] else out_link[fail[next_node]]
+
+    return goto, fail, output, out_link
+
+
+def write_index(index_file, rows, source):
+    """Compile the (title, imdbid) rows into an index file. Rows are kept in the given order, titles sharing the same
+    casefolded form are searched once. The source dict identifies what the index has been built from and is checked
+    by is_current()"""
+    patterns = {}
+    pattern_titles = []
+    for index, (text_title, imdbid) in enumerate(rows):
+        pattern_index = patterns.setdefault(text_title.casefold(), len(patterns))
+        if pattern_index == len(pattern_titles):
+            pattern_titles.append([])
+        pattern_titles[pattern_index].append(index)
+
+    goto, fail, output, out_link = build_automaton(patterns)
+
+    sections = {name: array.array("I") for name in INDEX_SECTIONS}
+    # transitions of each node, sorted by character so that they can be bisected
+    for transitions in goto:
+        sections["edge_start"].append(len(sections["edge_chars"]))
+        for char in sorted(transitions):
+            sections["edge_chars"].append(ord(char))
+            sections["edge_targets"].append(transitions[char])
+    sections["edge_start"].append(len(sections["edge_chars"]))
+    sections["fail"].extend(fail)
+    sections["out_link"].extend(out_link)
+    for pattern_indexes in output:
+        sections["out_start"].append(len(sections["out_patterns"]))
+        sections["out_patterns"].extend(pattern_indexes)
+    sections["out_start"].append(len(sections["out_patterns"]))
+    sections["pattern_length"].extend(len(pattern) for pattern in patterns)
+    for title_indexes in pattern_titles:
+        sections["pattern_start"].append(len(sections["pattern_titles"]))
+        sections["pattern_titles"].extend(title_indexes)
+    sections["pattern_start"].append(len(sections["pattern_titles"]))
+
+    blobs = {"titles": bytearray(), "imdbids": bytearray()}
+    for text_title, imdbid in rows:
+        sections["title_start"].append(len(blobs["titles"]))
+        blobs["titles"] += text_title.encode("utf-8")
+        sections["imdbid_start"].append(len(blobs["imdbids"]))
+        blobs["imdbids"] += imdbid.encode("utf-8")
+    sections["title_start"].append(len(blobs["titles"]))
+    sections["imdbid_start"].append(len(blobs["imdbids"]))
+
+    # the header gives the offset and the length in bytes of each section, sections are aligned on 4 bytes
+    layout = {}
+    offset = 0
+    for name in INDEX_SECTIONS:
+        layout[name] = [offset, len(sections[name]) * sections[name].itemsize]
+        offset += layout[name][1]
+    for name in INDEX_BLOBS:
+        layout[name] = [offset, len(blobs[name])]
+        offset += (len(blobs[name]) + 3) // 4 * 4
+    chunks = [sections[name] for name in INDEX_SECTIONS]
+    for name in INDEX_BLOBS:
+        chunks += [blobs[name], b"\0" * (-len(blobs[name]) % 4)]
+    write_index_file(index_file, INDEX_MAGIC, INDEX_VERSION, {"source": source, "layout": layout}, chunks, 4)
+
+    return len(rows)
+
+
+def open_index(index_file):
+    """Memory-map an index file. Returns a dict of memoryviews by section name, None if the file does not exist or
+    has not been written by this version"""
+    index = open_index_file(index_file, INDEX_MAGIC, INDEX_VERSION)
+    if index is None:
+        return None
+
+    data = index["data"]
+    for name in INDEX_SECTIONS:
+        offset, length = index["layout"][name]
+        index[name] = data[offset:offset + length].cast("I")
+    for name in INDEX_BLOBS:
+        offset, length = index["layout"][name]
+        index[name] = data[offset:offset + length]
+
+    return index
+
+
+def is_current(index, source):
+    """Tells if the index has been built from this source"""
+    return indexfile.is_current(index, source)
+
+
+def close_index(index):
+    """Release the memory-mapped file of an index"""
+    close_index_file(index, INDEX_SECTIONS + INDEX_BLOBS)
+
+
+def scan(index, text):
+    """Single pass of the automaton over the text. Yields (pattern index, end offset) for each occurrence"""
+    edge_start = index["edge_start"]
+    edge_chars = index["edge_chars"]
+    edge_targets = index["edge_targets"]
+    fail = index["fail"]
+    out_link = index["out_link"]
+    out_start = index["out_start"]
+    out_patterns = index["out_patterns"]
+
+    node = 0
+    for end, char in enumerate(text, start=1):
+        code = ord(char)
+        while True:
+            lo = edge_start[node]
+            hi = edge_start[node + 1]
+            position = bisect.bisect_left(edge_chars, code, lo, hi)
+            if position < hi and edge_chars[position] == code:
+                node = edge_targets[position]
+                break
+            if not node:
+                break
+            node = fail[node]
+        state = node
+        while state:
+            for position in range(out_start[state], out_start[state + 1]):
+                yield out_patterns[position], end
+            state = out_link[state]
+
+
+def pattern_length(index, pattern_index):
+    """Length of a pattern (a casefolded title)"""
+    return index["pattern_length"][pattern_index]
+
+
+def pattern_titles(index, pattern_index):
+    """Indexes of the titles whose casefolded form is this pattern"""
+    pattern_start = index["pattern_start"]
+
+    return index["pattern_titles"][pattern_start[pattern_index]:pattern_start[pattern_index + 1]].tolist()
+
+
+def title_count(index):
+    """Number of (title, imdbid) rows of the index"""
+    return len(index["title_start"]) - 1
+
+
+def title(index, title_index):
+    """Returns the (title, imdbid) row at this position"""
+    title_start = index["title_start"]
+    imdbid_start = index["imdbid_start"]
+
+    return (bytes(index["titles"][title_start[title_index]:title_start[title_index + 1]]).decode("utf-8"),
+            bytes(index["imdbids"][imdbid_start[title_index]:imdbid_start[title_index + 1]]).decode("utf-8"))
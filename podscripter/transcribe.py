@@ -0,0 +1,206 @@
+"""transcribe and stream actions : speech to text with VOSK, by chunks or over a whole episode"""
+import json
+import os
+import pathlib
+import sys
+from multiprocessing import Pool
+from os import listdir
+from os.path import isfile, join
+
+from vosk import Model, KaldiRecognizer, SetLogLevel
+
+from . import profiling
+from .audio import SAMPLE_RATE, pcm_blocks, progress
+
+TEXT_FILE = "transcribed.txt"
+# checkpoints of a transcription, one JSON line per chunk transcribed, next to the text file
+MANIFEST_EXTENSION = ".manifest"
+
+# VOSK model of the process, loaded on first use
+shared_model = None
+# VOSK model and recognizer of a transcription worker process, loaded once when the worker starts
+worker_model = None
+worker_recognizer = None
+
+
+def load_model():
+    """Returns the VOSK model, loaded once per process"""
+    global shared_model
+    if shared_model is None:
+        shared_model = Model("model")
+
+    return shared_model
+
+
+def __vosk_capture(model, recorder, audiofile_path):
+    """Captures sound and convert it to text"""
+    SetLogLevel(0)
+
+    for data in pcm_blocks(audiofile_path):
+        recorder.AcceptWaveform(data)
+
+    return json.loads(recorder.FinalResult())["text"]
+
+
+def __format_utterance(result, timestamps=False):
+    """Text of a VOSK result, preceded by the time of its first word when timestamps are asked"""
+    if timestamps and result.get("result"):
+        minutes, seconds = divmod(result["result"][0]["start"], 60)
+        hours, minutes = divmod(int(minutes), 60)
+        return "[%d:%02d:%05.2f] %s" % (hours, minutes, seconds, result["text"])
+
+    return result["text"]
+
+
+def __load_manifest(manifest_file):
+    """Returns the chunks already transcribed according to a manifest, as {chunk name: (chunk size, text)}
+    A line left incomplete by a crash is ignored, its chunk is transcribed again"""
+    done = {}
+    if os.path.isfile(manifest_file):
+        with open(manifest_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    checkpoint = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if checkpoint["status"] == "done":
+                    done[checkpoint["chunk"]] = (checkpoint["size"], checkpoint["text"])
+
+    return done
+
+
+def __write_checkpoint(manifest, chunk_filename, size, text):
+    """Record a chunk transcribed in the manifest, flushed right away to survive a crash"""
+    manifest.write(json.dumps({"chunk": chunk_filename, "size": size, "status": "done", "text": text}) + "\n")
+    manifest.flush()
+
+
+def __write_transcript_lines(texts, name_of_file=TEXT_FILE):
+    """Write the texts of the chunks in a file, one line per non-empty text"""
+    with open(name_of_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(text for text in texts if text != ""))
+
+
+def __init_transcription_worker():
+    """Loads the VOSK model in a transcription worker process, kept warm for all the chunks it will transcribe"""
+    global worker_model, worker_recognizer
+    worker_model = Model("model")
+    worker_recognizer = KaldiRecognizer(worker_model, SAMPLE_RATE)
+
+
+def __transcribe_chunk(chunk_path):
+    """Transcribe one chunk in a transcription worker process"""
+    return __vosk_capture(worker_model, worker_recognizer, chunk_path)
+
+
+def transcription(chunk_folder, workers=1):
+    """ Transcribe WAVE audio file into text using VOSK library
+    Produce a text file, named after the chunk folder, and returns it
+    With several workers, the chunks are dispatched to a pool of processes each holding its own VOSK model, the
+    texts being written back in the order of the chunks.
+    Each chunk transcribed is recorded in a manifest next to the text file, a run started again after a crash only
+    transcribes the chunks missing from it"""
+    if not os.path.exists("model"):
+        print(
+            "Please download the model from https://alphacephei.com/vosk/models and unpack as 'model' in the current folder.")
+        exit(1)
+
+    with profiling.stage("transcription") as counts:
+        filename = pathlib.PurePath(chunk_folder).name + ".txt"
+        manifest_file = filename + MANIFEST_EXTENSION
+        list_of_chunks = [f for f in sorted(listdir(chunk_folder)) if isfile(join(chunk_folder, f))]
+        chunk_sizes = {chunk_filename: os.path.getsize(join(chunk_folder, chunk_filename))
+                       for chunk_filename in list_of_chunks}
+
+        # chunks transcribed by a previous run are skipped, as long as they have not been converted again since
+        texts = {chunk_filename: text for chunk_filename, (size, text) in __load_manifest(manifest_file).items()
+                 if chunk_sizes.get(chunk_filename) == size}
+        pending_chunks = [chunk_filename for chunk_filename in list_of_chunks if chunk_filename not in texts]
+        chunk_paths = [chunk_folder + '/' + chunk_filename for chunk_filename in pending_chunks]
+        if texts:
+            print("Resuming, %d chunk(s) already transcribed" % len(texts))
+        counts.update(chunks=len(list_of_chunks), resumed=len(texts), transcribed=len(pending_chunks))
+
+        pool = None
+        if not pending_chunks:
+            texts_transcribed = []
+        elif workers > 1:
+            pool = Pool(workers, initializer=__init_transcription_worker)
+            texts_transcribed = pool.imap(__transcribe_chunk, chunk_paths)
+        else:
+            model = load_model()
+            rec = KaldiRecognizer(model, SAMPLE_RATE)
+            texts_transcribed = (__vosk_capture(model, rec, chunk_path) for chunk_path in chunk_paths)
+
+        # filename = time.strftime("%Y%m%d-%H%M%S") + ".txt"
+        # the manifest is started again from the valid checkpoints only, dropping a line cut by a crash
+        with open(manifest_file + ".tmp", "w", encoding="utf-8") as manifest:
+            for chunk_filename in list_of_chunks:
+                if chunk_filename in texts:
+                    __write_checkpoint(manifest, chunk_filename, chunk_sizes[chunk_filename], texts[chunk_filename])
+        os.replace(manifest_file + ".tmp", manifest_file)
+
+        with open(manifest_file, "a", encoding="utf-8") as manifest:
+            for chunk_filename, text_transcribed in zip(pending_chunks, texts_transcribed):
+                # process each chunk, checkpointed as soon as it is transcribed
+                texts[chunk_filename] = text_transcribed
+                __write_checkpoint(manifest, chunk_filename, chunk_sizes[chunk_filename], text_transcribed)
+                progress(len(texts), len(list_of_chunks), "Transcribing")
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        # the text file is rebuilt from the manifest, in the order of the chunks
+        __write_transcript_lines([texts[chunk_filename] for chunk_filename in list_of_chunks], filename)
+
+    print("\nEnded")
+
+    return filename
+
+
+def stream_transcription(audiofile_path, timestamps=False):
+    """ Transcribe a whole episode in a single pass, without converting it nor splitting it into chunk files
+    The PCM is fed straight to one recognizer, VOSK detecting the end of each utterance by itself. Every utterance
+    is written as a line of the text file as soon as it is final, the current partial result being displayed
+    meanwhile. Returns the text file"""
+    if not os.path.exists("model"):
+        print(
+            "Please download the model from https://alphacephei.com/vosk/models and unpack as 'model' in the current folder.")
+        exit(1)
+
+    with profiling.stage("stream") as counts:
+        filename = pathlib.PurePath(audiofile_path).stem + ".txt"
+        SetLogLevel(0)
+        rec = KaldiRecognizer(load_model(), SAMPLE_RATE)
+        if timestamps:
+            rec.SetWords(True)
+
+        # same separation of the lines as the transcription by chunks : no empty line, no newline at the end
+        with open(filename, "w", encoding="utf-8") as f:
+            separator = ""
+            fed = 0
+            for data in pcm_blocks(audiofile_path):
+                fed += len(data)
+                if rec.AcceptWaveform(data):
+                    result = json.loads(rec.Result())
+                else:
+                    # displaying the utterance being recognized, with the position in the episode
+                    partial = json.loads(rec.PartialResult())["partial"]
+                    sys.stdout.write('[%ds] %s\r' % (fed // (2 * SAMPLE_RATE), partial[-70:].ljust(70)))
+                    sys.stdout.flush()
+                    continue
+                if result["text"] != "":
+                    f.write(separator + __format_utterance(result, timestamps))
+                    f.flush()
+                    separator = "\n"
+                    counts["utterances"] = counts.get("utterances", 0) + 1
+            result = json.loads(rec.FinalResult())
+            if result["text"] != "":
+                f.write(separator + __format_utterance(result, timestamps))
+                counts["utterances"] = counts.get("utterances", 0) + 1
+        counts["seconds"] = fed // (2 * SAMPLE_RATE)
+
+    print("\nEnded")
+
+    return filename
@@ -9,6 +9,8 @@ setup(
     author_email='erikltt@hotmail.com',
     license='None',
     packages=['podscripter'],
-    install_requires=['spacy', 'requests', 'feedparser', 'pydub', 'vosk', 'names_dataset'],
+    package_data={'podscripter': ['mr_rules.json']},
+    entry_points={'console_scripts': ['podscripter = podscripter.__main__:main']},
+    install_requires=['spacy', 'requests', 'feedparser', 'pydub', 'numpy', 'vosk', 'names_dataset'],
     classifiers=[]
 )
@@ -0,0 +1,52 @@
+"""Local HTTP stand-in of the servers the downloads talk to (podcast feeds, IMDB datasets), run in a thread of the
+test process on a free port of localhost"""
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the files of the server by path. Every request is recorded as (method, path, headers) in the
+    requests list of the server, the tests reading them to check what has been asked"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, headers=None, length=None):
+        """Sends a response, length being the Content-Length announced when it is not the one of the body (the
+        connection is then closed once the body is sent, as a server cut off in the middle of the transfer)"""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body) if length is None else length))
+        if length is not None:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, dict(self.headers)))
+        if self.path not in self.server.files:
+            return self.send_body(404, b"not found")
+        self.send_body(200, self.server.files[self.path])
+
+
+@contextmanager
+def stand_in_server(handler=StandInHandler, files=None):
+    """Runs the server with these files ({path: bytes}), yields it : its url, its files and its requests"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.files = dict(files or {})
+    server.requests = []
+    server.url = "http://127.0.0.1:%d" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,106 @@
+"""Brute match of the titles of a title index built from a small list, and extraction of the titles of a small DB
+before and after its migration to the normalized titles"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init
+from podscripter import parse, titleindex
+
+# private to parse, taken outside of the test class whose body would mangle their names
+brute_match = parse.__brute_match
+database_extraction = parse.__database_extraction
+
+# rows of the title index, longest titles first as extracted from the DB
+TITLES = [("Les Jeunes Amants", "tt0000001"), ("Les Jeunes", "tt0000002"), ("Jeunes Amants", "tt0000003"),
+          ("Straße", "tt0000004"), ("Amants", "tt0000005"), ("Pater", "tt0000006"), ("PATER", "tt0000007"),
+          ("Up", "tt0000008")]
+
+# (title, rating) rows of the DB : unrated titles, titles of 2 characters or less and the exceptions are left out
+MOVIES = [("Les Jeunes Amants", 7.1), ("Film", 6.5), ("Le Nouveau", 6.0), ("Qui", 5.0), ("A un", 5.5), ("Up", 8.2),
+          ("Pater", 6.8), ("Maigret", 6.1), ("Inconnu", 0), ("Straße", 7.0)]
+
+
+class BruteMatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-brute-")
+        self.index_file = os.path.join(self.folder, "titles")
+        titleindex.write_index(self.index_file, TITLES, {"test": True})
+        self.index = titleindex.open_index(self.index_file)
+
+    def tearDown(self):
+        titleindex.close_index(self.index)
+        shutil.rmtree(self.folder)
+
+    def matched(self, text):
+        return [(text[start:end], title) for start, end, title, _ in brute_match(self.index, text)]
+
+    def test_scan(self):
+        # every occurrence of every pattern, overlapping ones included
+        text = "les jeunes amants d'une straße, pater"
+        patterns = {title.casefold() for title, _ in TITLES}
+        expected = sorted((text[end - len(pattern):end], end) for pattern in patterns
+                          for end in range(len(pattern), len(text) + 1) if text[end - len(pattern):end] == pattern)
+        found = sorted((text[end - titleindex.pattern_length(self.index, pattern_index):end], end)
+                       for pattern_index, end in titleindex.scan(self.index, text))
+        self.assertEqual(found, expected)
+
+    def test_word_boundaries(self):
+        self.assertEqual(self.matched("Pater, dans compater ou paternel et super"), [("Pater", "Pater")])
+        self.assertEqual(self.matched("up_date et up."), [("up", "Up")])
+
+    def test_longest_title_kept(self):
+        self.assertEqual(self.matched("le film les jeunes amants puis jeunes amants et les jeunes, amants"),
+                         [("les jeunes amants", "Les Jeunes Amants"), ("jeunes amants", "Jeunes Amants"),
+                          ("les jeunes", "Les Jeunes"), ("amants", "Amants")])
+
+    def test_same_casefold(self):
+        # titles of the same casefolded form are kept in the order of the extraction
+        self.assertEqual(self.matched("PaTeR"), [("PaTeR", "Pater")])
+
+    def test_casefold_expansion(self):
+        # ß is casefolded as ss, the offsets being those of the text
+        self.assertEqual(self.matched("Großes Straße, strasse et STRASSE pater"),
+                         [("Straße", "Straße"), ("strasse", "Straße"), ("STRASSE", "Straße"), ("pater", "Pater")])
+
+
+class DatabaseExtractionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-extraction-")
+        self.previous_folder = os.getcwd()
+        os.chdir(self.folder)
+        conn = sqlite3.connect(parse.DB_FILE)
+        conn.execute("create table movie(id integer primary key, title text, imdbid text, translated text, "
+                     "rating real)")
+        conn.executemany("insert into movie(title, imdbid, translated, rating) values (?, ?, ?, ?)",
+                         [(title, "tt%07d" % number, title, rating) for number, (title, rating) in enumerate(MOVIES)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.chdir(self.previous_folder)
+        shutil.rmtree(self.folder)
+
+    def test_filters(self):
+        expected = ["Les Jeunes Amants", "Maigret", "Straße", "Pater"]
+        # titles not normalized yet, filtered in Python
+        self.assertEqual([title for title, _ in database_extraction()], expected)
+
+        conn = sqlite3.connect(parse.DB_FILE)
+        init.migrate(conn)
+        conn.close()
+        self.assertEqual([title for title, _ in database_extraction()], expected)
+        # only the titles whose words are all in the text
+        self.assertEqual([title for title, _ in database_extraction("le film les jeunes amants, puis pater")],
+                         ["Les Jeunes Amants", "Pater"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Silence detection and split of the convert action against pydub.silence, which it replaces, on generated WAV
+files in the format of the converter (16 kHz mono) and of a CD (44.1 kHz stereo)"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podscripter import convert
+
+try:
+    from pydub import AudioSegment, silence
+except ImportError:
+    AudioSegment = silence = None
+
+# private to convert, taken outside of the test class whose body would mangle their names
+wav_samples = convert.__wav_samples
+dbfs = convert.__dbfs
+detect_silence = convert.__detect_silence
+split_on_silence = convert.__split_on_silence
+
+MIN_SILENCE_LEN = 300
+KEEP_SILENCE = 100
+
+
+def write_wav(wav_file, frame_rate, channels, seed):
+    """Tones of random lengths and loudness between quiet noises, some of them shorter than MIN_SILENCE_LEN, the
+    length of the file not being a whole number of ms"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for part in range(12):
+        noise_frames = int(rng.integers(100, 900)) * frame_rate // 1000
+        parts.append(rng.normal(0, rng.integers(5, 400), (noise_frames, channels)))
+        # the file ends with a tone, the last chunk going up to its last frame
+        tone_frames = int(rng.integers(50, 900)) * frame_rate // 1000 + (frame_rate * 3 // 4000 if part == 11 else 0)
+        times = np.arange(tone_frames) / frame_rate
+        tone = rng.integers(500, 12000) * np.sin(2 * np.pi * rng.integers(100, 1000) * times)
+        parts.append(np.repeat(tone[:, None], channels, axis=1) + rng.normal(0, 200, (tone_frames, channels)))
+    samples = np.clip(np.concatenate(parts), -32768, 32767).astype("<i2")
+
+    with wave.open(wav_file, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(samples.tobytes())
+
+
+@unittest.skipUnless(silence, "pydub is not installed")
+class SilenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-convert-")
+        # blocks shorter than the files, the silences standing across blocks
+        self.previous_block_ms = convert.SILENCE_BLOCK_MS
+        convert.SILENCE_BLOCK_MS = 1000
+
+    def tearDown(self):
+        convert.SILENCE_BLOCK_MS = self.previous_block_ms
+        shutil.rmtree(self.folder)
+
+    def assertSameAsPydub(self, frame_rate, channels):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                wav_file = os.path.join(self.folder, "episode%d.wav" % seed)
+                write_wav(wav_file, frame_rate, channels, seed)
+                samples, read_frame_rate = wav_samples(wav_file)
+                segment = AudioSegment.from_wav(wav_file)
+                self.assertEqual(read_frame_rate, frame_rate)
+                self.assertEqual(samples.tobytes(), segment.raw_data)
+
+                self.assertAlmostEqual(dbfs(samples, frame_rate), segment.dBFS)
+                silence_thresh = segment.dBFS - 14
+                silent_ranges = detect_silence(samples, frame_rate, MIN_SILENCE_LEN, silence_thresh)
+                self.assertGreater(len(silent_ranges), 1)
+                self.assertEqual(silent_ranges, silence.detect_silence(segment, MIN_SILENCE_LEN, silence_thresh,
+                                                                       seek_step=1))
+
+                chunk_bounds = split_on_silence(samples, frame_rate, MIN_SILENCE_LEN, silence_thresh, KEEP_SILENCE)
+                chunks = silence.split_on_silence(segment, MIN_SILENCE_LEN, silence_thresh, KEEP_SILENCE)
+                self.assertEqual(len(chunk_bounds), len(chunks))
+                for (start, end), chunk in zip(chunk_bounds, chunks):
+                    data = samples[start:end].tobytes()
+                    # pydub pads a chunk with up to 2 ms of silence past the last frame of the file
+                    self.assertEqual(data, chunk.raw_data[:len(data)])
+                    self.assertLessEqual(len(chunk.raw_data) - len(data), 2 * frame_rate // 1000 * segment.frame_width)
+                    self.assertFalse(any(chunk.raw_data[len(data):]))
+
+    def test_converter_format(self):
+        self.assertSameAsPydub(16000, 1)
+
+    def test_stereo(self):
+        self.assertSameAsPydub(44100, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Download of the episodes of a feed, against a local stand-in of the podcast server"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from localserver import StandInHandler, stand_in_server
+from podscripter import download
+
+
+class PodcastHandler(StandInHandler):
+    """Podcast server whose episodes listed in the truncated set of the server are cut off halfway"""
+
+    def do_GET(self):
+        if self.path in self.server.truncated and self.path in self.server.files:
+            self.server.requests.append(("GET", self.path, dict(self.headers)))
+            episode = self.server.files[self.path]
+            return self.send_body(200, episode[:len(episode) // 2], length=len(episode))
+        super().do_GET()
+
+
+def episode_guid(number):
+    return "urn:podcast:episode-%d" % number
+
+
+def episode_content(number):
+    return bytes([number]) * (200000 + number)
+
+
+def write_feed(server, count):
+    """RSS feed of count episodes, whose enclosures are served by the server"""
+    items = "".join('<item><guid isPermaLink="false">%s</guid><title>Episode %d</title><link>%s/page/%d</link>'
+                    '<enclosure url="%s/ep%d.mp3" type="audio/mpeg" length="1"/></item>'
+                    % (episode_guid(number), number, server.url, number, server.url, number)
+                    for number in range(count))
+    server.files["/feed.xml"] = ('<?xml version="1.0"?><rss version="2.0"><channel><title>Podcast</title>%s'
+                                 '</channel></rss>' % items).encode("utf-8")
+    for number in range(count):
+        server.files["/ep%d.mp3" % number] = episode_content(number)
+
+
+def episode_requests(server):
+    return sorted(path for _, path, _ in server.requests if path.endswith(".mp3"))
+
+
+class DownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-download-")
+        self.previous_folder = os.getcwd()
+        os.chdir(self.folder)
+        self.server_context = stand_in_server(PodcastHandler)
+        self.server = self.server_context.__enter__()
+        self.server.truncated = set()
+        self.feed_url = self.server.url + "/feed.xml"
+
+    def tearDown(self):
+        self.server_context.__exit__(None, None, None)
+        os.chdir(self.previous_folder)
+        shutil.rmtree(self.folder)
+
+    def assertDownloaded(self, numbers):
+        for number in numbers:
+            with open(os.path.join(download.PODCAST_DIR, "ep%d.mp3" % number), "rb") as f:
+                self.assertEqual(f.read(), episode_content(number))
+
+    def test_first_poll(self):
+        write_feed(self.server, 3)
+        self.assertEqual(download.download_rss_feed(self.feed_url, 2), 3)
+
+        self.assertDownloaded(range(3))
+        self.assertEqual(sorted(os.listdir(download.PODCAST_DIR)), ["ep0.mp3", "ep1.mp3", "ep2.mp3", "seen.json"])
+        with open(download.SEEN_EPISODES_FILE) as f:
+            self.assertEqual(json.load(f), [episode_guid(number) for number in range(3)])
+
+    def test_incremental_poll(self):
+        write_feed(self.server, 3)
+        download.download_rss_feed(self.feed_url, 2)
+        self.server.requests.clear()
+
+        # only the episodes added to the feed are fetched
+        write_feed(self.server, 5)
+        self.assertEqual(download.download_rss_feed(self.feed_url, 2), 2)
+        self.assertEqual(episode_requests(self.server), ["/ep3.mp3", "/ep4.mp3"])
+        self.assertDownloaded(range(5))
+
+        self.server.requests.clear()
+        self.assertEqual(download.download_rss_feed(self.feed_url, 2), 0)
+        self.assertEqual(episode_requests(self.server), [])
+
+    def test_truncated_episode(self):
+        write_feed(self.server, 3)
+        self.server.truncated.add("/ep1.mp3")
+        with self.assertRaises(requests.exceptions.RequestException):
+            download.download_rss_feed(self.feed_url, 1)
+
+        # the episode cut off is never left as a whole file, nor recorded as downloaded
+        self.assertFalse(os.path.isfile(os.path.join(download.PODCAST_DIR, "ep1.mp3")))
+        self.assertNotIn(episode_guid(1), download.load_seen_episodes())
+
+        # the next poll fetches it again, the .part file being replaced
+        self.server.truncated.clear()
+        self.server.requests.clear()
+        download.download_rss_feed(self.feed_url, 1)
+        self.assertIn("/ep1.mp3", episode_requests(self.server))
+        self.assertDownloaded(range(3))
+        self.assertEqual(download.load_seen_episodes(), {episode_guid(number) for number in range(3)})
+        self.assertFalse([name for name in os.listdir(download.PODCAST_DIR) if name.endswith(".part")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Download of the IMDB datasets by init.py (resume, conditional re-fetch), against a local stand-in of the IMDB
+server"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init
+from localserver import StandInHandler, stand_in_server
+
+# private to init.py, taken outside of the test class whose body would mangle its name
+download_dataset = init.__download_imdb_dataset
+
+DATASET_PATH = "/title.basics.tsv.gz"
+
+
+class DatasetHandler(StandInHandler):
+    """IMDB server of a single dataset, with its ETag : answers conditional requests (304) and ranges (206 or 416
+    when the range starts at the end of the dataset). The next response is cut off halfway when cut is set on the
+    server, and the next range is answered from the start of the dataset when wrong_range is set"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(("GET", self.path, dict(self.headers)))
+        dataset = server.dataset
+        headers = {"ETag": server.etag}
+        if self.headers.get("If-None-Match") == server.etag:
+            return self.send_body(304, b"", headers)
+
+        if "Range" in self.headers and self.headers.get("If-Range") == server.etag:
+            offset = int(self.headers["Range"][len("bytes="):-len("-")])
+            if offset >= len(dataset):
+                return self.send_body(416, b"", {"Content-Range": "bytes */%d" % len(dataset)})
+            if server.wrong_range:
+                server.wrong_range = False
+                offset = 0
+            headers["Content-Range"] = "bytes %d-%d/%d" % (offset, len(dataset) - 1, len(dataset))
+            return self.send_body(206, dataset[offset:], headers)
+
+        if server.cut:
+            server.cut = False
+            return self.send_body(200, dataset[:len(dataset) // 2], headers, length=len(dataset))
+        self.send_body(200, dataset, headers)
+
+
+class InitDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-init-")
+        self.previous_folder = os.getcwd()
+        os.chdir(self.folder)
+        # small chunks, so that part of a response cut off is written before the error
+        self.previous_chunk_size = init.DOWNLOAD_CHUNK_SIZE
+        init.DOWNLOAD_CHUNK_SIZE = 4096
+        self.server_context = stand_in_server(DatasetHandler)
+        self.server = self.server_context.__enter__()
+        self.set_dataset(os.urandom(300000), '"v1"')
+        self.server.cut = self.server.wrong_range = False
+        self.url = self.server.url + DATASET_PATH
+        self.dataset_file = init.IMDB_DATASET_DIR + os.path.basename(DATASET_PATH)
+
+    def tearDown(self):
+        self.server_context.__exit__(None, None, None)
+        init.DOWNLOAD_CHUNK_SIZE = self.previous_chunk_size
+        os.chdir(self.previous_folder)
+        shutil.rmtree(self.folder)
+
+    def set_dataset(self, dataset, etag):
+        self.server.dataset = dataset
+        self.server.etag = etag
+
+    def write_part(self, length, etag):
+        """Dataset partly downloaded by a previous run"""
+        os.makedirs(init.IMDB_DATASET_DIR, exist_ok=True)
+        with open(self.dataset_file + ".part", "wb") as f:
+            f.write(self.server.dataset[:length])
+        with open(self.dataset_file + ".meta", "w") as f:
+            json.dump({"etag": etag, "last_modified": None}, f)
+
+    def assertDataset(self):
+        with open(self.dataset_file, "rb") as f:
+            self.assertEqual(f.read(), self.server.dataset)
+        self.assertFalse(os.path.isfile(self.dataset_file + ".part"))
+
+    def last_request_headers(self):
+        return self.server.requests[-1][2]
+
+    def test_not_modified(self):
+        self.assertEqual(download_dataset(self.url), self.dataset_file)
+        self.assertDataset()
+
+        # the dataset is only asked for again if it changed, the server answering 304
+        modified_time = os.path.getmtime(self.dataset_file)
+        self.assertEqual(download_dataset(self.url), self.dataset_file)
+        self.assertEqual(self.last_request_headers().get("If-None-Match"), '"v1"')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(os.path.getmtime(self.dataset_file), modified_time)
+
+        # a new version is downloaded
+        self.set_dataset(os.urandom(200000), '"v2"')
+        download_dataset(self.url)
+        self.assertDataset()
+
+    def test_resume_after_cut_connection(self):
+        self.server.cut = True
+        with self.assertRaises(requests.exceptions.RequestException):
+            download_dataset(self.url)
+        self.assertFalse(os.path.isfile(self.dataset_file))
+        part_size = os.path.getsize(self.dataset_file + ".part")
+        self.assertGreater(part_size, 0)
+
+        # the next run only asks for the rest of the dataset
+        download_dataset(self.url)
+        self.assertEqual(self.last_request_headers().get("Range"), "bytes=%d-" % part_size)
+        self.assertEqual(self.last_request_headers().get("If-Range"), '"v1"')
+        self.assertDataset()
+
+    def test_part_already_complete(self):
+        # the whole dataset is in the part file, the server answers 416 to the range
+        self.write_part(len(self.server.dataset), '"v1"')
+        download_dataset(self.url)
+        self.assertEqual(self.last_request_headers().get("Range"), "bytes=%d-" % len(self.server.dataset))
+        self.assertDataset()
+
+    def test_dataset_changed_since_part(self):
+        # If-Range does not match, the server sends the whole new dataset
+        self.write_part(100000, '"v0"')
+        download_dataset(self.url)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertDataset()
+
+    def test_range_not_matching(self):
+        # a range which is not the one asked for, the download starts over
+        self.write_part(100000, '"v1"')
+        self.server.wrong_range = True
+        download_dataset(self.url)
+        self.assertNotIn("Range", self.last_request_headers())
+        self.assertDataset()
+
+
+if __name__ == '__main__':
+    unittest.main()
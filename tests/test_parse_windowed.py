@@ -0,0 +1,110 @@
+"""Parse of a transcribed file window by window against the parse of the whole file, with the approximate match, on
+a small DB. spaCy runs a blank French pipeline whose tags are set by a few rules of the test, so that no model is
+needed"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import spacy
+from spacy.language import Language
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podscripter import fuzzyindex, nlp, parse, titleindex
+
+TITLES = ["L'Avventura", "La Notte", "Les Jeunes Amants", "Vous ne désirez que moi", "Rien à foutre", "Pater",
+          "Maigret", "Film", "Le Désert rouge"]
+
+# titles mangled by the transcription, some of them cut by a line break : a title does not stand across two lines
+TRANSCRIPT = """film la ventura Claire Simon
+Le film les jeunes amants de Carine Tardieu
+voir la noté ce soir
+ce film Rien à foutre
+film la
+ventura Claire Simon
+Alain Cavalier dans pater
+on a vu le film le désert
+rouge de Michelangelo Antonioni
+maigret le film de Patrice Leconte
+voir la
+noté ce soir
+film vous ne désirez que moi Claire Simon
+"""
+
+DETERMINERS = {"le", "la", "les", "ce", "son", "un", "une"}
+PREPOSITIONS = {"de", "d'", "dans"}
+VERBS = {"appelle", "voir", "vu"}
+
+
+@Language.component("rule_tagger")
+def rule_tagger(doc):
+    """Part of speech and lemma of the tokens, enough for the matching rules"""
+    for token in doc:
+        if token.lower_ in DETERMINERS:
+            token.pos_ = "DET"
+        elif token.lower_ in PREPOSITIONS:
+            token.pos_ = "ADP"
+        elif token.lower_ in VERBS:
+            token.pos_ = "VERB"
+        elif token.text[:1].isupper():
+            token.pos_ = "PROPN"
+        else:
+            token.pos_ = "NOUN"
+        token.lemma_ = token.lower_
+    return doc
+
+
+class ParseWindowedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="podscripter-parse-")
+        self.previous_folder = os.getcwd()
+        os.chdir(self.folder)
+        self.previous_nlp = nlp.shared_nlp
+        nlp.shared_nlp = spacy.blank("fr")
+        nlp.shared_nlp.add_pipe("rule_tagger")
+        parse.compiled_rules = parse.shared_index = parse.shared_approximate_index = None
+
+        conn = sqlite3.connect(parse.DB_FILE)
+        conn.execute("create table movie(id integer primary key, title text, imdbid text, translated text, "
+                     "rating real)")
+        conn.executemany("insert into movie(title, imdbid, translated, rating) values (?, ?, ?, 7)",
+                         [(title, "tt%07d" % number, title) for number, title in enumerate(TITLES)])
+        conn.commit()
+        conn.close()
+        self.transcribed_file = "episode.txt"
+        with open(self.transcribed_file, "w", encoding="utf-8") as f:
+            f.write(TRANSCRIPT)
+
+    def tearDown(self):
+        if parse.shared_approximate_index is not None:
+            fuzzyindex.close_index(parse.shared_approximate_index)
+        if parse.shared_index is not None:
+            titleindex.close_index(parse.shared_index)
+        parse.compiled_rules = parse.shared_index = parse.shared_approximate_index = None
+        nlp.shared_nlp = self.previous_nlp
+        os.chdir(self.previous_folder)
+        shutil.rmtree(self.folder)
+
+    def test_same_as_parse(self):
+        films = parse.parse(self.transcribed_file, distance=1)
+        self.assertIn("L'Avventura", films)
+        self.assertIn("La Notte", films)
+        self.assertIn("les jeunes amants", films)
+        self.assertNotIn("Le Désert rouge", films)
+        for window_words in (3, 7, 20, 10000):
+            with self.subTest(window_words=window_words):
+                self.assertEqual(parse.parse_windowed(self.transcribed_file, window_words, distance=1), films)
+
+    def test_exact_by_default(self):
+        films = parse.parse(self.transcribed_file)
+        self.assertNotIn("L'Avventura", films)
+        self.assertIn("les jeunes amants", films)
+        self.assertEqual(parse.parse_windowed(self.transcribed_file, 7), films)
+
+
+if __name__ == '__main__':
+    unittest.main()